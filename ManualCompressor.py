@@ -1,6 +1,8 @@
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from background import BackgroundJob, ProgressPanel
+from lzw_format import OperationCancelled, compress_file as compress_file_blocks
 
 def lzw_compress(uncompressed, max_dict_size=None):
     """LZW sıkıştırma algoritması"""
@@ -53,7 +55,7 @@ class LZWCompressorGUI:
         
         # Pencere boyutu ve konumu
         window_width = 500
-        window_height = 400
+        window_height = 480
         screen_width = root.winfo_screenwidth()
         screen_height = root.winfo_screenheight()
         x = (screen_width - window_width) // 2
@@ -81,11 +83,16 @@ class LZWCompressorGUI:
         bit_length_combo.grid(row=1, column=1, pady=5, sticky=tk.W)
         
         # Dosya seçim düğmesi
-        ttk.Button(main_frame, text="Dosya Seç ve Sıkıştır", command=self.compress_file).grid(row=2, column=0, columnspan=2, pady=20)
+        self.compress_button = ttk.Button(main_frame, text="Dosya Seç ve Sıkıştır", command=self.compress_file)
+        self.compress_button.grid(row=2, column=0, columnspan=2, pady=10)
+        
+        # İlerleme, hız, kalan süre ve iptal düğmesi
+        self.progress_panel = ProgressPanel(main_frame, cancel_text="İptal")
+        self.progress_panel.grid(row=3, column=0, columnspan=2, pady=5)
         
         # Durum mesajları için metin kutusu
-        self.status_text = tk.Text(main_frame, height=10, width=50)
-        self.status_text.grid(row=3, column=0, columnspan=2, pady=5)
+        self.status_text = tk.Text(main_frame, height=8, width=50)
+        self.status_text.grid(row=4, column=0, columnspan=2, pady=5)
         
     def compress_file(self):
         # Dosya seç
@@ -101,42 +108,52 @@ class LZWCompressorGUI:
             # Parametreleri al
             max_dict_size = int(self.dict_size_var.get())
             code_bit_length = int(self.bit_length_var.get())
+        except ValueError as e:
+            messagebox.showerror("Hata", f"Geçersiz parametre: {str(e)}")
+            return
             
-            # Dosyayı oku
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = f.read()
-            
-            # Sıkıştır
-            compressed = lzw_compress(data, max_dict_size)
-            
-            # Çıktı dosya adını oluştur
-            dir_path = os.path.dirname(input_file)
-            base_name = os.path.basename(input_file)
-            name, _ = os.path.splitext(base_name)
-            output_dir = f"output_dict{max_dict_size}_code{code_bit_length}bit"
-            os.makedirs(os.path.join(dir_path, output_dir), exist_ok=True)
-            compressed_file = os.path.join(dir_path, output_dir, f"{name}.lzw")
-            
-            # Sıkıştırılmış veriyi kaydet
-            save_compressed_file(compressed_file, compressed, code_bit_length)
-            
-            # Sonuçları göster
-            original_size = os.path.getsize(input_file)
-            compressed_size = os.path.getsize(compressed_file)
-            ratio = compressed_size / original_size
-            
-            status = f"Sıkıştırma tamamlandı!\n\n"
-            status += f"Orijinal dosya: {input_file}\n"
-            status += f"Sıkıştırılmış dosya: {compressed_file}\n"
-            status += f"Orijinal boyut: {original_size} bytes\n"
-            status += f"Sıkıştırılmış boyut: {compressed_size} bytes\n"
-            status += f"Sıkıştırma oranı: {ratio:.2%}\n"
-            
-            self.status_text.delete(1.0, tk.END)
-            self.status_text.insert(tk.END, status)
+        # Çıktı dosya adını oluştur
+        dir_path = os.path.dirname(input_file)
+        base_name = os.path.basename(input_file)
+        name, _ = os.path.splitext(base_name)
+        output_dir = f"output_dict{max_dict_size}_code{code_bit_length}bit"
+        os.makedirs(os.path.join(dir_path, output_dir), exist_ok=True)
+        compressed_file = os.path.join(dir_path, output_dir, f"{name}.lzw")
+        
+        # Arka planda sıkıştır; pencere donmaz ve işlem iptal edilebilir
+        job = BackgroundJob(compress_file_blocks, input_file, compressed_file, code_bit_length, max_dict_size)
+        total = os.path.getsize(input_file)
+        job.kwargs.update(progress=lambda done: job.report_progress(done, total),
+                          cancel_event=job.cancel_event)
+        
+        self.status_text.delete(1.0, tk.END)
+        self.status_text.insert(tk.END, f"Sıkıştırılıyor: {input_file}\n")
+        self.progress_panel.run(job, lambda result, error: self.compression_done(input_file, compressed_file, error),
+                                busy_widgets=[self.compress_button])
+        
+    def compression_done(self, input_file, compressed_file, error):
+        self.status_text.delete(1.0, tk.END)
+        if isinstance(error, OperationCancelled):
+            # Yarım kalan çıktı dosyası zaten silindi
+            self.status_text.insert(tk.END, "Sıkıştırma iptal edildi, yarım kalan dosya silindi.\n")
+            return
+        if error is not None:
+            messagebox.showerror("Hata", f"Sıkıştırma sırasında hata oluştu: {str(error)}")
+            return
             
-        except Exception as e:
-            messagebox.showerror("Hata", f"Sıkıştırma sırasında hata oluştu: {str(e)}")
+        # Sonuçları göster
+        original_size = os.path.getsize(input_file)
+        compressed_size = os.path.getsize(compressed_file)
+        ratio = compressed_size / original_size if original_size else 0
+        
+        status = f"Sıkıştırma tamamlandı!\n\n"
+        status += f"Orijinal dosya: {input_file}\n"
+        status += f"Sıkıştırılmış dosya: {compressed_file}\n"
+        status += f"Orijinal boyut: {original_size} bytes\n"
+        status += f"Sıkıştırılmış boyut: {compressed_size} bytes\n"
+        status += f"Sıkıştırma oranı: {ratio:.2%}\n"
+        
+        self.status_text.insert(tk.END, status)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,506 @@
+import io
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+from lzw_codec import DEFAULT_CHUNK_SIZE
+from lzw_format import (DEFAULT_BLOCK_SIZE, DEFAULT_DEDUP_WINDOW_BITS, FLAG_HUFFMAN, BlockReader,
+                        CorruptFileError, OperationCancelled, compress_stream, scan_stream, verify_stream)
+from memory_budget import plan_decompression
+
+# Archive layout:
+#   ARCHIVE_MAGIC
+#   member 0 .. member N-1   (each a complete block-format .lzw stream)
+#   central directory        (one DIRECTORY_ENTRY + name per member)
+#   TRAILER                  (directory offset, member count, directory CRC32)
+ARCHIVE_MAGIC = b'\x89LZA'
+TRAILER_MAGIC = b'LZA\x00'
+
+# magic, directory offset, member count, directory CRC32
+TRAILER = struct.Struct('>4sQII')
+
+# member offset, compressed size, original size, original CRC32,
+# code bit length, max dictionary size (0 = no limit), name length
+DIRECTORY_ENTRY = struct.Struct('>QQQIBIH')
+
+# Buffer size used for archive file I/O.
+IO_BUFFER_SIZE = 1 << 20
+
+ArchiveMember = namedtuple('ArchiveMember', [
+    'name', 'offset', 'compressed_size', 'original_size', 'crc32',
+    'code_bit_length', 'max_dict_size',
+])
+
+
+def is_archive(filename):
+    """
+    Return True if `filename` is an `.lza` archive.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+class ArchiveWriter:
+    """
+    Pack many compressed files into one `.lza` archive.
+
+    Members are written back to back as block-format streams, followed by a
+    central directory listing each member's name, offset, sizes and CRC32.
+    Member names are unique; they may contain '/'-separated directories.
+
+    Parameters:
+        filename (str): The archive to create.
+    """
+
+    def __init__(self, filename):
+        self.f = open(filename, 'wb', buffering=IO_BUFFER_SIZE)
+        self.f.write(ARCHIVE_MAGIC)
+        self.members = []
+        self.names = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # An archive whose creation failed is removed rather than finished
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+    def add_stream(self, name, src, code_bit_length, max_dict_size=None, block_size=DEFAULT_BLOCK_SIZE,
+                   flags=0, progress=None, cancel_event=None, dedup_window_bits=DEFAULT_DEDUP_WINDOW_BITS,
+                   compact=False):
+        """
+        Compress everything readable from `src` as member `name`.
+
+        If the compression fails or is cancelled, the member's partial bytes
+        are cut off again, so later members and the directory stay valid.
+
+        Parameters:
+            name (str): Member name stored in the directory.
+            src (file): Binary file object to read.
+            code_bit_length (int): Number of bits used to represent each code.
+            max_dict_size (int, optional): The maximum size of the dictionary.
+            block_size (int): Number of original bytes per block.
+            flags (int): Stage flags recorded in the member's stream header.
+            progress (callable, optional): Passed to `compress_stream`.
+            cancel_event (threading.Event, optional): Passed to `compress_stream`.
+            dedup_window_bits (int): Passed to `compress_stream`.
+            compact (bool): Passed to `compress_stream`.
+
+        Returns:
+            ArchiveMember: The directory entry of the new member.
+
+        Raises:
+            ValueError: If the archive already has a member named `name`.
+        """
+        if name in self.names:
+            raise ValueError(f"The archive already has a member named {name!r}")
+        offset = self.f.tell()
+        try:
+            original_size, crc = compress_stream(src, self.f, code_bit_length, max_dict_size,
+                                                 block_size, flags, progress, cancel_event,
+                                                 dedup_window_bits, compact)
+        except BaseException:
+            self.f.seek(offset)
+            self.f.truncate()
+            raise
+        member = ArchiveMember(name, offset, self.f.tell() - offset, original_size, crc,
+                               code_bit_length, max_dict_size)
+        self.members.append(member)
+        self.names.add(name)
+        return member
+
+    def add_file(self, path, code_bit_length, max_dict_size=None, arcname=None, block_size=DEFAULT_BLOCK_SIZE,
+                 flags=0, progress=None, cancel_event=None, dedup_window_bits=DEFAULT_DEDUP_WINDOW_BITS,
+                 compact=False):
+        """
+        Compress the file at `path` as a new member.
+
+        Each member may use its own dictionary settings.
+
+        Parameters:
+            path (str): The file to add.
+            code_bit_length (int): Number of bits used to represent each code.
+            max_dict_size (int, optional): The maximum size of the dictionary.
+            arcname (str, optional): Member name; defaults to the file name.
+            block_size (int): Number of original bytes per block.
+            flags (int): Stage flags recorded in the member's stream header.
+            progress (callable, optional): Passed to `compress_stream`.
+            cancel_event (threading.Event, optional): Passed to `compress_stream`.
+            dedup_window_bits (int): Passed to `compress_stream`.
+            compact (bool): Passed to `compress_stream`.
+
+        Returns:
+            ArchiveMember: The directory entry of the new member.
+        """
+        name = arcname if arcname is not None else os.path.basename(path)
+        with open(path, 'rb', buffering=IO_BUFFER_SIZE) as src:
+            return self.add_stream(name, src, code_bit_length, max_dict_size, block_size,
+                                   flags, progress, cancel_event, dedup_window_bits, compact)
+
+    def discard(self):
+        """
+        Close and delete an unfinished archive.
+        """
+        if not self.f.closed:
+            self.f.close()
+        try:
+            os.remove(self.f.name)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """
+        Write the central directory and trailer, then close the archive.
+        """
+        if self.f.closed:
+            return
+        directory = bytearray()
+        for member in self.members:
+            name = member.name.encode('utf-8')
+            directory += DIRECTORY_ENTRY.pack(member.offset, member.compressed_size,
+                                              member.original_size, member.crc32,
+                                              member.code_bit_length, member.max_dict_size or 0,
+                                              len(name))
+            directory += name
+        directory_offset = self.f.tell()
+        self.f.write(directory)
+        self.f.write(TRAILER.pack(TRAILER_MAGIC, directory_offset, len(self.members),
+                                  zlib.crc32(directory)))
+        self.f.close()
+
+
+class ArchiveReader:
+    """
+    Read the central directory of a `.lza` archive and extract members.
+
+    Opening the archive reads the trailer and directory; extracting a member
+    then needs a single seek to its offset.
+
+    Parameters:
+        filename (str): The archive to open.
+        buffer_size (int): Read buffer size; small under a memory budget.
+    """
+
+    def __init__(self, filename, buffer_size=IO_BUFFER_SIZE):
+        self.f = open(filename, 'rb', buffering=buffer_size)
+        try:
+            self.members = self._read_directory()
+        except Exception:
+            self.f.close()
+            raise
+        self.by_name = {member.name: member for member in self.members}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def _read_directory(self):
+        if self.f.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            raise CorruptFileError("Not an .lza archive")
+        self.f.seek(-TRAILER.size, os.SEEK_END)
+        magic, directory_offset, count, crc = TRAILER.unpack(self.f.read(TRAILER.size))
+        if magic != TRAILER_MAGIC:
+            raise CorruptFileError("Archive trailer is missing; the archive may be truncated")
+        directory_size = self.f.tell() - TRAILER.size - directory_offset
+        self.f.seek(directory_offset)
+        directory = self.f.read(directory_size)
+        if len(directory) != directory_size or zlib.crc32(directory) != crc:
+            raise CorruptFileError("Archive directory checksum mismatch")
+
+        members = []
+        pos = 0
+        for _ in range(count):
+            (offset, compressed_size, original_size, crc32,
+             code_bit_length, max_dict_size, name_length) = DIRECTORY_ENTRY.unpack_from(directory, pos)
+            pos += DIRECTORY_ENTRY.size
+            name = directory[pos:pos + name_length].decode('utf-8')
+            pos += name_length
+            members.append(ArchiveMember(name, offset, compressed_size, original_size, crc32,
+                                         code_bit_length, max_dict_size or None))
+        return members
+
+    def list(self):
+        """
+        Return the directory entries of all members.
+        """
+        return list(self.members)
+
+    def _member(self, name):
+        if isinstance(name, ArchiveMember):
+            return name
+        member = self.by_name.get(name)
+        if member is None:
+            raise KeyError(f"No member named {name!r} in the archive")
+        return member
+
+    def plan_member(self, name, memory_budget):
+        """
+        Pick the chunk size for extracting member `name` within a budget.
+
+        The dictionary limit comes from the directory entry; the block
+        headers are scanned for the largest block when the member's blocks
+        are decoded whole.
+
+        Returns:
+            int: The chunk size to pass to `extract`.
+
+        Raises:
+            MemoryBudgetError: If the member cannot be extracted within the budget.
+        """
+        member = self._member(name)
+        self.f.seek(member.offset)
+        header, _, largest = scan_stream(self.f)
+        return plan_decompression(memory_budget, member.code_bit_length, member.max_dict_size,
+                                  largest if header.flags else None,
+                                  bool(header.flags & FLAG_HUFFMAN)).chunk_size
+
+    def extract_to_stream(self, name, dst, progress=None, cancel_event=None,
+                          chunk_size=DEFAULT_CHUNK_SIZE, compact=False):
+        """
+        Decompress member `name` into `dst`, checking every block checksum.
+
+        Members compressed with FLAG_DEDUP read earlier output back from
+        `dst`, which must then be readable and seekable.
+
+        Parameters:
+            name (str or ArchiveMember): The member to extract, by name or
+                                         by its directory entry.
+            dst (file): Binary file object to write.
+            progress (callable, optional): Called with the number of original
+                                           bytes written after each piece.
+            cancel_event (threading.Event, optional): Checked after each piece;
+                                                      when set, OperationCancelled
+                                                      is raised.
+            chunk_size (int): Size of the pieces written to `dst`.
+            compact (bool): Keep the dictionary in a CompactDictionary, whose
+                            footprint `plan_member` budgets for.
+
+        Returns:
+            int: Number of original bytes written.
+        """
+        member = self._member(name)
+        crc = 0
+        written = 0
+
+        def sink(data):
+            nonlocal crc, written
+            crc = zlib.crc32(data, crc)
+            dst.write(data)
+            written += len(data)
+            if progress is not None:
+                progress(written)
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Extraction cancelled")
+
+        self.f.seek(member.offset)
+        written = BlockReader(self.f, dst, compact=compact).copy_to(sink, chunk_size)
+        if written != member.original_size or crc != member.crc32:
+            raise CorruptFileError(f"Member {member.name!r} does not match its directory entry")
+        return written
+
+    def verify(self, name):
+        """
+        Check every block checksum of member `name` without writing its output.
+
+        Returns:
+            dict: Number of blocks and of original bytes checked.
+
+        Raises:
+            CorruptFileError: If the member is malformed, a checksum differs or
+                              its size does not match its directory entry.
+        """
+        member = self._member(name)
+        self.f.seek(member.offset)
+        report = verify_stream(self.f)
+        if report['Original Size (bytes)'] != member.original_size:
+            raise CorruptFileError(f"Member {member.name!r} does not match its directory entry")
+        return report
+
+    def extract(self, name, output_path, progress=None, cancel_event=None,
+                chunk_size=DEFAULT_CHUNK_SIZE, compact=False):
+        """
+        Decompress member `name` (a name or a directory entry) to `output_path`.
+
+        If cancelled or interrupted by an error, the partial output file is
+        removed. `chunk_size` and `compact` are passed to `extract_to_stream`;
+        with `compact` the output is written through a small buffer.
+
+        Returns:
+            int: Number of original bytes written.
+        """
+        buffer_size = io.DEFAULT_BUFFER_SIZE if compact else IO_BUFFER_SIZE
+        try:
+            with open(output_path, 'w+b', buffering=buffer_size) as dst:
+                return self.extract_to_stream(name, dst, progress, cancel_event, chunk_size, compact)
+        except Exception:
+            _remove_file(output_path)
+            raise
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _member_path(output_dir, name):
+    """
+    Return where member `name` is extracted under `output_dir`.
+
+    Raises:
+        CorruptFileError: If the name is empty, absolute or leads out of
+                          `output_dir`.
+    """
+    parts = name.split('/')
+    relative = os.path.join(*parts)
+    if any(part in ('', '.', '..') for part in parts) or os.path.isabs(relative) \
+            or os.path.splitdrive(relative)[0]:
+        raise CorruptFileError(f"Member name {name!r} is not a relative path")
+    return os.path.join(output_dir, relative)
+
+
+def _make_parents(path, stop):
+    """
+    Create the missing directories above `path`, below `stop`.
+
+    Returns:
+        List[str]: The directories created, deepest first.
+    """
+    created = []
+    parent = os.path.dirname(path)
+    while parent != stop and not os.path.isdir(parent):
+        created.append(parent)
+        parent = os.path.dirname(parent)
+    for directory in reversed(created):
+        os.mkdir(directory)
+    return created
+
+
+def extract_all(archive_path, output_dir, progress=None, cancel_event=None, memory_budget=None):
+    """
+    Extract every member of an archive into `output_dir`.
+
+    Members are extracted by directory entry, each to its own path; an
+    archive with two members of the same name is rejected. If cancelled or
+    interrupted by an error, the files and directories already created by
+    this call are removed again.
+
+    Parameters:
+        archive_path (str): The archive to extract.
+        output_dir (str): The directory to extract into.
+        progress (callable, optional): Called with the number of compressed
+                                       archive bytes processed so far.
+        cancel_event (threading.Event, optional): Checked after each piece;
+                                                  when set, OperationCancelled
+                                                  is raised.
+        memory_budget (int, optional): Maximum bytes for the dictionary and
+                                       buffers, planned for each member.
+
+    Returns:
+        List[str]: Paths of the extracted files.
+    """
+    created_dir = not os.path.isdir(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    extracted = []
+    created_dirs = []
+    done = 0
+    try:
+        buffer_size = IO_BUFFER_SIZE if memory_budget is None else io.DEFAULT_BUFFER_SIZE
+        with ArchiveReader(archive_path, buffer_size) as reader:
+            members = reader.list()
+            if len({member.name for member in members}) != len(members):
+                raise CorruptFileError("Archive has several members with the same name")
+            for member in members:
+                output_path = _member_path(output_dir, member.name)
+                created_dirs += _make_parents(output_path, output_dir)
+                member_progress = None
+                if progress is not None:
+                    # Scale the member's original bytes to its compressed size
+                    def member_progress(written, member=member):
+                        progress(done + member.compressed_size * written // max(member.original_size, 1))
+                chunk_size = DEFAULT_CHUNK_SIZE
+                if memory_budget is not None:
+                    chunk_size = reader.plan_member(member, memory_budget)
+                reader.extract(member, output_path, member_progress, cancel_event, chunk_size,
+                               memory_budget is not None)
+                extracted.append(output_path)
+                done += member.compressed_size
+    except Exception:
+        for path in extracted:
+            _remove_file(path)
+        for directory in sorted(created_dirs, key=len, reverse=True):
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        if created_dir and not os.listdir(output_dir):
+            os.rmdir(output_dir)
+        raise
+    return extracted
+
+
+def verify_archive(archive_path):
+    """
+    Check the directory checksum and every member's block checksums.
+
+    Returns:
+        dict: Number of members, blocks and original bytes checked.
+
+    Raises:
+        CorruptFileError: If the directory or a member is corrupt.
+    """
+    blocks = 0
+    original_size = 0
+    with ArchiveReader(archive_path) as reader:
+        for member in reader.list():
+            try:
+                report = reader.verify(member)
+            except CorruptFileError as e:
+                raise CorruptFileError(f"Member {member.name!r}: {e}") from e
+            blocks += report['Blocks']
+            original_size += report['Original Size (bytes)']
+        return {'Members': len(reader.members), 'Blocks': blocks, 'Original Size (bytes)': original_size}
+
+
+def create_archive(archive_path, file_paths, code_bit_length, max_dict_size=None):
+    """
+    Compress multiple files into a single archive with shared settings.
+
+    Parameters:
+        archive_path (str): The archive to create.
+        file_paths (List[str]): The files to add.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+
+    Returns:
+        List[ArchiveMember]: The directory entries written.
+    """
+    with ArchiveWriter(archive_path) as archive:
+        for path in file_paths:
+            archive.add_file(path, code_bit_length, max_dict_size)
+        return archive.members
+
+
+if __name__ == "__main__":
+    # Usage: python archive.py list ARCHIVE
+    #        python archive.py extract ARCHIVE MEMBER OUTPUT
+    command, archive_path = sys.argv[1], sys.argv[2]
+    with ArchiveReader(archive_path) as reader:
+        if command == 'list':
+            for member in reader.list():
+                print(f"{member.name}\t{member.original_size}\t{member.compressed_size}\t"
+                      f"{member.crc32:08x}\tdict={member.max_dict_size or 'No Limit'}\t"
+                      f"code={member.code_bit_length}bit")
+        elif command == 'extract':
+            reader.extract(sys.argv[3], sys.argv[4])
+        else:
+            print(f"Unknown command: {command}")
+            sys.exit(2)
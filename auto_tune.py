@@ -0,0 +1,264 @@
+import os
+import sys
+import time
+from collections import namedtuple
+from compact_dictionary import CompactDictionary
+from lzw_codec import LZWEncoder
+from lzw_format import DEFAULT_BLOCK_SIZE, HEADER, BLOCK_HEADER
+from memory_budget import MemoryBudgetError, compression_buffer_bytes, plan_compression
+
+# Objectives accepted by `tune_file`.
+OBJECTIVE_RATIO = 'ratio'    # smallest estimated output
+OBJECTIVE_SPEED = 'speed'    # highest sample throughput among near-best ratios
+OBJECTIVE_MEMORY = 'memory'  # smallest footprint among near-best ratios, within a memory cap
+OBJECTIVES = (OBJECTIVE_RATIO, OBJECTIVE_SPEED, OBJECTIVE_MEMORY)
+
+# Bytes of each input that are actually compressed, taken as evenly spaced
+# pieces so that the sample covers the whole file: 1/SAMPLE_FRACTION of it,
+# but at least MIN_SAMPLE_SIZE and at most SAMPLE_SIZE bytes.
+SAMPLE_SIZE = 256 * 1024
+MIN_SAMPLE_SIZE = 32 * 1024
+SAMPLE_FRACTION = 8
+SAMPLE_PIECES = 8
+
+# Code widths tried; each uses the full 2^width dictionary.
+CANDIDATE_CODE_BIT_LENGTHS = (9, 10, 11, 12, 13, 14, 15, 16, 18, 20)
+
+# Files smaller than this are not worth tuning: they get SMALL_FILE_CODE_BIT_LENGTH,
+# unless it does not fit in the memory cap.
+MIN_TUNE_SIZE = 64 * 1024
+SMALL_FILE_CODE_BIT_LENGTH = 12
+
+# Candidates are no longer tried once the estimated size has grown for this
+# many consecutive widths: past its best width LZW only gets bigger.
+PRUNE_AFTER_GROWTH = 2
+
+# The speed and memory objectives only consider candidates whose estimated
+# size is within this fraction of the best one.
+SPEED_SIZE_SLACK = 0.10
+MEMORY_SIZE_SLACK = 0.10
+
+Candidate = namedtuple('Candidate', [
+    'code_bit_length',  # Number of bits used to represent each code
+    'max_dict_size',    # Dictionary limit
+    'estimated_size',   # Estimated size of the whole compressed file in bytes
+    'mb_per_s',         # Compression throughput measured on the sample
+    'memory_bytes',     # Dictionary and buffer footprint while compressing
+])
+
+
+def sample_size_for(file_size):
+    """
+    Return the number of bytes sampled from a file of `file_size` bytes.
+    """
+    return min(SAMPLE_SIZE, max(MIN_SAMPLE_SIZE, file_size // SAMPLE_FRACTION))
+
+
+def read_sample(path, sample_size=None, pieces=SAMPLE_PIECES):
+    """
+    Read up to `sample_size` bytes of a file as `pieces` evenly spaced slices.
+
+    Parameters:
+        path (str): The file to sample.
+        sample_size (int, optional): Defaults to `sample_size_for` the file.
+        pieces (int): Number of slices.
+
+    Returns:
+        Tuple[bytes, int]: The sample and the size of the whole file.
+    """
+    file_size = os.path.getsize(path)
+    if sample_size is None:
+        sample_size = sample_size_for(file_size)
+    with open(path, 'rb') as f:
+        if file_size <= sample_size:
+            return f.read(), file_size
+        piece_size = sample_size // pieces
+        stride = (file_size - piece_size) // (pieces - 1)
+        sample = bytearray()
+        for i in range(pieces):
+            f.seek(i * stride)
+            sample += f.read(piece_size)
+        return bytes(sample), file_size
+
+
+def _encode_sample(sample, max_dict_size):
+    """
+    Count the codes `sample` produces with a dictionary limit.
+
+    Returns:
+        Tuple[int, float, bool]: The number of codes, the seconds taken and
+        whether the dictionary reached its limit.
+    """
+    encoder = LZWEncoder(max_dict_size)
+    start = time.perf_counter()
+    code_count = len(encoder.encode(sample)) + len(encoder.flush())
+    elapsed = time.perf_counter() - start
+    return code_count, elapsed, len(encoder) >= max_dict_size
+
+
+def estimate_candidate(sample, file_size, code_bit_length, max_dict_size=None, memory_cap=None,
+                       encoded=None, dedup=False, entropy=False):
+    """
+    Estimate the compressed size of a file for one setting by counting the
+    codes its sample produces, without packing or writing them.
+
+    Parameters:
+        sample (bytes): Sample of the file.
+        file_size (int): Size of the whole file.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): Dictionary limit; defaults to 2^code_bit_length.
+        memory_cap (int, optional): Memory budget the setting must fit in.
+        encoded (Tuple[int, float], optional): Code count and seconds already
+                                               measured on this sample for the
+                                               same codes; the sample is then
+                                               not encoded again.
+        dedup (bool): Whether the dedup stage runs, for the memory plan.
+        entropy (bool): Whether the Huffman stage runs, for the memory plan.
+
+    Returns:
+        Candidate: The estimate.
+
+    Raises:
+        MemoryBudgetError: If the setting does not fit in `memory_cap`.
+    """
+    max_dict_size = max_dict_size or 1 << code_bit_length
+    if memory_cap is not None:
+        plan = plan_compression(memory_cap, code_bit_length, max_dict_size, dedup, entropy)
+        memory_bytes = plan.dictionary_bytes + plan.buffer_bytes + plan.dedup_bytes
+        block_size = plan.chunk_size
+    else:
+        memory_bytes = (CompactDictionary.estimate_nbytes(max_dict_size)
+                        + compression_buffer_bytes(DEFAULT_BLOCK_SIZE, code_bit_length))
+        block_size = DEFAULT_BLOCK_SIZE
+
+    if encoded is None:
+        code_count, elapsed, _ = _encode_sample(sample, max_dict_size)
+    else:
+        code_count, elapsed = encoded
+
+    scale = file_size / len(sample) if sample else 0
+    blocks = -(-file_size // block_size)
+    estimated_size = (HEADER.size + (blocks + 1) * BLOCK_HEADER.size
+                      + int(code_count * scale * code_bit_length / 8))
+    mb_per_s = len(sample) / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    return Candidate(code_bit_length, max_dict_size, estimated_size, mb_per_s, memory_bytes)
+
+
+def evaluate_candidates(sample, file_size, memory_cap=None,
+                        code_bit_lengths=CANDIDATE_CODE_BIT_LENGTHS, dedup=False, entropy=False):
+    """
+    Estimate every candidate setting that fits in `memory_cap`.
+
+    The sample is encoded once per width only until a dictionary no longer
+    fills up on it: every wider candidate then emits the same codes, so its
+    estimate is derived from that count without encoding again. Widths are
+    no longer tried once the estimate has grown PRUNE_AFTER_GROWTH times in
+    a row. `dedup` and `entropy` are passed to `estimate_candidate`.
+
+    Returns:
+        List[Candidate]: The estimates, in the order of `code_bit_lengths`.
+    """
+    candidates = []
+    unfilled = None  # (code count, seconds, dictionary limit) of a dictionary that never filled
+    growth = 0
+    for code_bit_length in code_bit_lengths:
+        if growth >= PRUNE_AFTER_GROWTH:
+            break
+        max_dict_size = 1 << code_bit_length
+        try:
+            if memory_cap is not None:
+                plan_compression(memory_cap, code_bit_length, max_dict_size, dedup, entropy)
+            if unfilled is not None:
+                encoded = unfilled[:2]
+            else:
+                code_count, elapsed, filled = _encode_sample(sample, max_dict_size)
+                encoded = (code_count, elapsed)
+                if not filled:
+                    unfilled = (code_count, elapsed, max_dict_size)
+            candidate = estimate_candidate(sample, file_size, code_bit_length, max_dict_size,
+                                           memory_cap, encoded, dedup, entropy)
+        except MemoryBudgetError:
+            continue
+        if candidates and candidate.estimated_size > candidates[-1].estimated_size:
+            growth += 1
+        else:
+            growth = 0
+        candidates.append(candidate)
+    return candidates
+
+
+def choose_candidate(candidates, objective=OBJECTIVE_RATIO):
+    """
+    Pick the best candidate for an objective.
+
+    Parameters:
+        candidates (List[Candidate]): Estimates from `evaluate_candidates`.
+        objective (str): One of OBJECTIVES. 'ratio' picks the smallest
+                         estimate; 'speed' and 'memory' pick the highest
+                         throughput or the smallest footprint among the
+                         candidates close to it. The memory cap itself is
+                         applied when the candidates are evaluated.
+
+    Returns:
+        Candidate: The chosen setting.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown tuning objective '{objective}'; expected one of {', '.join(OBJECTIVES)}")
+    if not candidates:
+        raise MemoryBudgetError("No candidate setting fits in the memory cap.")
+    # Ties go to the narrower code, which needs less memory
+    best = min(candidates, key=lambda c: (c.estimated_size, c.code_bit_length))
+    if objective == OBJECTIVE_SPEED:
+        close = [c for c in candidates if c.estimated_size <= best.estimated_size * (1 + SPEED_SIZE_SLACK)]
+        return max(close, key=lambda c: c.mb_per_s)
+    if objective == OBJECTIVE_MEMORY:
+        close = [c for c in candidates if c.estimated_size <= best.estimated_size * (1 + MEMORY_SIZE_SLACK)]
+        return min(close, key=lambda c: (c.memory_bytes, c.estimated_size))
+    return best
+
+
+def tune_file(path, objective=OBJECTIVE_RATIO, memory_cap=None, dedup=False, entropy=False):
+    """
+    Pick the code bit length and dictionary size for a file.
+
+    Files below MIN_TUNE_SIZE only get the default width estimated, so that
+    tuning a batch of small files costs about as much as compressing them.
+
+    Parameters:
+        path (str): The file to compress.
+        objective (str): 'ratio', 'speed' or 'memory'.
+        memory_cap (int, optional): Memory budget in bytes; required for the
+                                    'memory' objective and honoured by all.
+        dedup (bool): Whether the file is compressed with the dedup stage.
+        entropy (bool): Whether the file is compressed with the Huffman stage.
+
+    Returns:
+        Candidate: The chosen setting.
+    """
+    if objective == OBJECTIVE_MEMORY and memory_cap is None:
+        raise ValueError("The 'memory' objective needs a memory cap.")
+    sample, file_size = read_sample(path)
+    candidates = []
+    if file_size < MIN_TUNE_SIZE:
+        candidates = evaluate_candidates(sample, file_size, memory_cap, (SMALL_FILE_CODE_BIT_LENGTH,),
+                                         dedup, entropy)
+    if not candidates:
+        candidates = evaluate_candidates(sample, file_size, memory_cap, CANDIDATE_CODE_BIT_LENGTHS,
+                                         dedup, entropy)
+    return choose_candidate(candidates, objective)
+
+
+if __name__ == "__main__":
+    # Usage: python auto_tune.py [ratio|speed|memory [MEMORY_CAP_MB]] FILE [FILE ...]
+    args = sys.argv[1:]
+    objective = args.pop(0) if args and args[0] in OBJECTIVES else OBJECTIVE_RATIO
+    memory_cap = int(float(args.pop(0)) * 1024 * 1024) if objective == OBJECTIVE_MEMORY else None
+    for path in args:
+        sample, file_size = read_sample(path)
+        candidates = evaluate_candidates(sample, file_size, memory_cap)
+        chosen = choose_candidate(candidates, objective)
+        print(path)
+        for c in candidates:
+            marker = '*' if c == chosen else ' '
+            print(f"  {marker} {c.code_bit_length:2d} bits, dict {c.max_dict_size:8d}: "
+                  f"~{c.estimated_size} bytes, {c.mb_per_s:.2f} MB/s, {c.memory_bytes / (1024 * 1024):.1f} MB")
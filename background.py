@@ -0,0 +1,177 @@
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+# How often the Tk main loop drains the job queue, in milliseconds.
+POLL_INTERVAL_MS = 100
+
+
+def format_progress(done, total, elapsed):
+    """
+    Describe progress as processed/total megabytes, throughput and ETA.
+
+    Parameters:
+        done (int): Bytes processed so far.
+        total (int): Total bytes to process, or 0 if unknown.
+        elapsed (float): Seconds since the job started.
+
+    Returns:
+        str: A one-line status text.
+    """
+    mb_done = done / (1024 * 1024)
+    rate = mb_done / elapsed if elapsed > 0 else 0.0
+    text = f"{mb_done:.1f} MB"
+    if total:
+        text += f" / {total / (1024 * 1024):.1f} MB"
+    text += f", {rate:.2f} MB/s"
+    if total and rate > 0:
+        remaining = (total - done) / (1024 * 1024) / rate
+        text += f", ETA {remaining:.0f} s"
+    return text
+
+
+class BackgroundJob:
+    """
+    Run a function in a worker thread and report back to the Tk main loop.
+
+    The worker never touches Tk. It reports progress and message boxes
+    through a thread-safe queue, which `poll` drains on the main thread
+    with `after()`. `cancel` sets `cancel_event`, which the compression and
+    decompression functions check between blocks.
+
+    Parameters:
+        target (callable): The function to run.
+        *args, **kwargs: Arguments for `target`.
+    """
+
+    def __init__(self, target, *args, **kwargs):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.started_at = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _run(self):
+        result = None
+        error = None
+        try:
+            result = self.target(*self.args, **self.kwargs)
+        except Exception as e:
+            error = e
+        self.queue.put(('done', result, error))
+
+    # Called from the worker thread
+
+    def report_progress(self, done, total=0):
+        self.queue.put(('progress', done, total, time.perf_counter() - self.started_at))
+
+    def showinfo(self, title, message):
+        self.queue.put(('message', 'info', title, message))
+
+    def showwarning(self, title, message):
+        self.queue.put(('message', 'warning', title, message))
+
+    def showerror(self, title, message):
+        self.queue.put(('message', 'error', title, message))
+
+    # Called on the Tk main thread
+
+    def poll(self, root, on_progress, on_message, on_done):
+        """
+        Drain the queue and reschedule until the job is done.
+
+        Parameters:
+            root (tk.Tk): Widget used to schedule the next poll.
+            on_progress (callable): Called with (done, total, elapsed).
+            on_message (callable): Called with (kind, title, message).
+            on_done (callable): Called once with (result, error).
+        """
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == 'progress':
+                on_progress(*item[1:])
+            elif item[0] == 'message':
+                on_message(*item[1:])
+            else:
+                on_done(*item[1:])
+                return
+        root.after(POLL_INTERVAL_MS, self.poll, root, on_progress, on_message, on_done)
+
+
+class ProgressPanel(tk.Frame):
+    """
+    Progress bar, status line and cancel button for a BackgroundJob.
+
+    Parameters:
+        parent (tk.Widget): The parent widget.
+        cancel_text (str): Label of the cancel button.
+    """
+
+    def __init__(self, parent, cancel_text="Cancel"):
+        super().__init__(parent)
+        self.job = None
+        self.busy_widgets = ()
+        self.progressbar = ttk.Progressbar(self, length=300, mode='determinate', maximum=100)
+        self.progressbar.pack(pady=2)
+        self.status_label = tk.Label(self, text="")
+        self.status_label.pack(pady=2)
+        self.cancel_button = tk.Button(self, text=cancel_text, state=tk.DISABLED, command=self.cancel)
+        self.cancel_button.pack(pady=2)
+
+    def run(self, job, on_done, busy_widgets=()):
+        """
+        Start `job` and track it until it finishes.
+
+        Parameters:
+            job (BackgroundJob): The job, not yet started.
+            on_done (callable): Called on the main thread with (result, error).
+            busy_widgets (Iterable[tk.Widget]): Disabled while the job runs.
+        """
+        self.job = job
+        self.busy_widgets = tuple(busy_widgets)
+        for widget in self.busy_widgets:
+            widget.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progressbar['value'] = 0
+        self.status_label.config(text="")
+
+        def finished(result, error):
+            self.job = None
+            for widget in self.busy_widgets:
+                widget.config(state=tk.NORMAL)
+            self.cancel_button.config(state=tk.DISABLED)
+            on_done(result, error)
+
+        job.start()
+        job.poll(self, self.show_progress, self.show_message, finished)
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def show_progress(self, done, total, elapsed):
+        if total:
+            self.progressbar['value'] = 100 * done / total
+        self.status_label.config(text=format_progress(done, total, elapsed))
+
+    def show_message(self, kind, title, message):
+        show = {'info': messagebox.showinfo,
+                'warning': messagebox.showwarning,
+                'error': messagebox.showerror}[kind]
+        show(title, message)
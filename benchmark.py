@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from compress import lzw_compress, save_compressed_file
+from decompressor import lzw_decompress, read_compressed_file
+from entropy import encode_block, decode_block
+from lzw_codec import LZWEncoder
+from lzw_format import FLAG_HUFFMAN, compress_file, decompress_file
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_CORPUS_SIZE = 256 * 1024
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 1234
+
+# Parameters every stage is measured with.
+CODE_BIT_LENGTH = 16
+MAX_DICT_SIZE = 1 << 16
+
+_WORDS = ("the of and to in is was that for it with as on be at by this had not are but from "
+          "or have an they which one you were her all she there would their we him been has "
+          "when who will more no if out so said what up its about into than them can only "
+          "other new some could time these two may then do first any my now such like our "
+          "over man me even most made after also did many before must through back years "
+          "where much your way well down should because each just those people how too "
+          "little state good very make world still own see men work long get here between "
+          "both life being under never day same another know while last might us great old "
+          "year off come since against go came right used take three").split()
+
+
+def corpus_random(rng, size):
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def corpus_repetitive(rng, size):
+    unit = b"ABABABAB-0123456789-" * 4
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def corpus_english(rng, size):
+    out = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(6, 18)))
+        sentence = sentence.capitalize() + '. '
+        if rng.random() < 0.1:
+            sentence += '\n\n'
+        out.append(sentence)
+        length += len(sentence)
+    return ''.join(out).encode('ascii')[:size]
+
+
+def corpus_json_logs(rng, size):
+    levels = ['DEBUG', 'INFO', 'INFO', 'INFO', 'WARN', 'ERROR']
+    services = ['auth', 'billing', 'search', 'gateway', 'storage']
+    out = []
+    length = 0
+    timestamp = 1700000000.0
+    while length < size:
+        timestamp += rng.random()
+        line = json.dumps({
+            'ts': round(timestamp, 3),
+            'level': rng.choice(levels),
+            'service': rng.choice(services),
+            'request_id': f"{rng.getrandbits(64):016x}",
+            'latency_ms': rng.randint(1, 2000),
+            'message': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(3, 9))),
+        }) + '\n'
+        out.append(line)
+        length += len(line)
+    return ''.join(out).encode('ascii')[:size]
+
+
+def corpus_binary(rng, size):
+    # Fixed-layout records with small counters and a few noisy fields,
+    # similar to sensor dumps or database pages
+    out = bytearray()
+    record_id = 0
+    while len(out) < size:
+        record_id += 1
+        out += record_id.to_bytes(4, 'little')
+        out += (record_id % 17).to_bytes(2, 'little')
+        out += bytes(8)
+        out += rng.getrandbits(16).to_bytes(2, 'little')
+        out += b'\xff\xfe' * 2
+    return bytes(out[:size])
+
+
+CORPORA = {
+    'random': corpus_random,
+    'repetitive': corpus_repetitive,
+    'english': corpus_english,
+    'json_logs': corpus_json_logs,
+    'binary': corpus_binary,
+}
+
+
+def generate_corpus(name, size, seed=DEFAULT_SEED):
+    """
+    Generate a deterministic corpus: the same name, size and seed always give
+    the same bytes.
+    """
+    return CORPORA[name](random.Random(f"{seed}:{name}"), size)
+
+
+def _stages(workdir):
+    """
+    Return the benchmarked stages as (name, setup, run) triples.
+
+    `setup(data)` prepares the stage input outside the timed region and
+    `run(state)` performs the measured work, returning the number of
+    original bytes processed and the compressed size.
+    """
+    legacy_path = os.path.join(workdir, 'legacy.lzw')
+    block_path = os.path.join(workdir, 'block.lzw')
+    input_path = os.path.join(workdir, 'input.bin')
+    output_path = os.path.join(workdir, 'output.bin')
+
+    def setup_text(data):
+        return data.decode('latin-1')
+
+    def run_lzw_compress(text):
+        codes = lzw_compress(text, MAX_DICT_SIZE)
+        return len(text), len(codes) * CODE_BIT_LENGTH // 8
+
+    def setup_codes(data):
+        return lzw_compress(data.decode('latin-1'), MAX_DICT_SIZE), len(data)
+
+    def run_save(state):
+        codes, size = state
+        save_compressed_file(legacy_path, codes, CODE_BIT_LENGTH)
+        return size, os.path.getsize(legacy_path)
+
+    def setup_saved(data):
+        codes, size = setup_codes(data)
+        save_compressed_file(legacy_path, codes, CODE_BIT_LENGTH)
+        return size
+
+    def run_read(size):
+        read_compressed_file(legacy_path, CODE_BIT_LENGTH)
+        return size, os.path.getsize(legacy_path)
+
+    def run_lzw_decompress(state):
+        codes, size = state
+        lzw_decompress(list(codes), CODE_BIT_LENGTH, MAX_DICT_SIZE)
+        return size, len(codes) * CODE_BIT_LENGTH // 8
+
+    def setup_input(data):
+        with open(input_path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    def run_compress_file(size):
+        compress_file(input_path, block_path, CODE_BIT_LENGTH, MAX_DICT_SIZE)
+        return size, os.path.getsize(block_path)
+
+    def setup_block(data):
+        size = setup_input(data)
+        compress_file(input_path, block_path, CODE_BIT_LENGTH, MAX_DICT_SIZE)
+        return size
+
+    def run_decompress_file(size):
+        decompress_file(block_path, output_path)
+        return size, os.path.getsize(block_path)
+
+    def setup_block_codes(data):
+        encoder = LZWEncoder(MAX_DICT_SIZE)
+        codes = encoder.encode(data)
+        codes.extend(encoder.flush())
+        return codes, len(data)
+
+    def run_entropy_encode(state):
+        codes, size = state
+        return size, len(encode_block(codes, CODE_BIT_LENGTH))
+
+    def setup_entropy_payload(data):
+        codes, size = setup_block_codes(data)
+        return encode_block(codes, CODE_BIT_LENGTH), size
+
+    def run_entropy_decode(state):
+        payload, size = state
+        decode_block(payload, CODE_BIT_LENGTH)
+        return size, len(payload)
+
+    def run_compress_file_huffman(size):
+        compress_file(input_path, block_path, CODE_BIT_LENGTH, MAX_DICT_SIZE, flags=FLAG_HUFFMAN)
+        return size, os.path.getsize(block_path)
+
+    def setup_block_huffman(data):
+        size = setup_input(data)
+        compress_file(input_path, block_path, CODE_BIT_LENGTH, MAX_DICT_SIZE, flags=FLAG_HUFFMAN)
+        return size
+
+    return [
+        ('lzw_compress', setup_text, run_lzw_compress),
+        ('save_compressed_file', setup_codes, run_save),
+        ('read_compressed_file', setup_saved, run_read),
+        ('lzw_decompress', setup_codes, run_lzw_decompress),
+        ('compress_file', setup_input, run_compress_file),
+        ('decompress_file', setup_block, run_decompress_file),
+        ('entropy_encode', setup_block_codes, run_entropy_encode),
+        ('entropy_decode', setup_entropy_payload, run_entropy_decode),
+        ('compress_file_huffman', setup_input, run_compress_file_huffman),
+        ('decompress_file_huffman', setup_block_huffman, run_decompress_file),
+    ]
+
+
+def measure_stage(setup, run, data, repeat):
+    """
+    Measure one stage on one corpus.
+
+    Throughput is taken from the fastest of `repeat` runs; peak memory from
+    one extra run under tracemalloc, which would otherwise skew the timing.
+
+    Returns:
+        dict: MB/s, peak traced bytes and compression ratio.
+    """
+    best = None
+    for _ in range(repeat):
+        state = setup(data)
+        start = time.perf_counter()
+        original_size, compressed_size = run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    state = setup(data)
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'mb_per_s': original_size / (1024 * 1024) / best if best > 0 else 0.0,
+        'peak_bytes': peak,
+        'ratio': compressed_size / original_size if original_size else 0.0,
+    }
+
+
+def run_benchmarks(size=DEFAULT_CORPUS_SIZE, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED,
+                   corpora=None, stages=None):
+    """
+    Run every stage on every corpus.
+
+    Returns:
+        dict: {'corpus_size', 'seed', 'results': {corpus: {stage: metrics}}}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for corpus_name in corpora or CORPORA:
+            data = generate_corpus(corpus_name, size, seed)
+            results[corpus_name] = {}
+            for stage_name, setup, run in _stages(workdir):
+                if stages and stage_name not in stages:
+                    continue
+                metrics = measure_stage(setup, run, data, repeat)
+                results[corpus_name][stage_name] = metrics
+                print(f"{corpus_name:<12} {stage_name:<24} {metrics['mb_per_s']:8.3f} MB/s "
+                      f"{metrics['peak_bytes'] / 1024:10.1f} KiB peak  ratio {metrics['ratio']:.4f}")
+    return {'corpus_size': size, 'seed': seed, 'results': results}
+
+
+def compare_to_baseline(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    List the regressions of `current` against `baseline`.
+
+    A regression is a throughput drop or a peak memory increase of more than
+    `threshold` (a fraction), or any increase of the compression ratio.
+
+    Returns:
+        List[str]: One description per regression.
+    """
+    regressions = []
+    if (current['corpus_size'], current['seed']) != (baseline['corpus_size'], baseline['seed']):
+        return [f"Baseline was recorded with corpus size {baseline['corpus_size']} and seed "
+                f"{baseline['seed']}; rerun with the same settings or update the baseline"]
+    for corpus_name, stages in current['results'].items():
+        for stage_name, metrics in stages.items():
+            old = baseline['results'].get(corpus_name, {}).get(stage_name)
+            if old is None:
+                continue
+            where = f"{corpus_name}/{stage_name}"
+            if metrics['mb_per_s'] < old['mb_per_s'] * (1 - threshold):
+                regressions.append(f"{where}: throughput {metrics['mb_per_s']:.3f} MB/s, "
+                                   f"baseline {old['mb_per_s']:.3f} MB/s")
+            if metrics['peak_bytes'] > old['peak_bytes'] * (1 + threshold):
+                regressions.append(f"{where}: peak memory {metrics['peak_bytes']} bytes, "
+                                   f"baseline {old['peak_bytes']} bytes")
+            if metrics['ratio'] > old['ratio'] + 1e-9:
+                regressions.append(f"{where}: ratio {metrics['ratio']:.6f}, baseline {old['ratio']:.6f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LZW performance regression benchmarks")
+    parser.add_argument('--size', type=int, default=DEFAULT_CORPUS_SIZE, help="bytes per corpus")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per stage")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA), help="limit to these corpora")
+    parser.add_argument('--stage', action='append', help="limit to these stages")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed fractional regression in throughput and memory")
+    parser.add_argument('--update-baseline', action='store_true', help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.size, args.repeat, args.seed, args.corpus, args.stage)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to '{args.baseline}'.")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(current, baseline, args.threshold)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
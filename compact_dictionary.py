@@ -0,0 +1,232 @@
+import sys
+from array import array
+
+# Marker for an unused hash table slot and for the prefix of a root entry.
+EMPTY = -1
+
+# Number of single-byte root entries every LZW dictionary starts with.
+ROOT_ENTRIES = 256
+
+# Initial capacity used when the dictionary has no size limit.
+DEFAULT_CAPACITY = 4096
+
+_HASH_MULTIPLIER = 0x9E3779B1
+
+
+def _zeroed_array(typecode, length, fill=0):
+    """
+    Allocate an array of exactly `length` items without over-allocation.
+
+    Parameters:
+        typecode (str): The array type code.
+        length (int): Number of items.
+        fill (int): Value of every item.
+
+    Returns:
+        array: The new array.
+    """
+    return array(typecode, [fill]) * length
+
+
+def _array_nbytes(typecode, length):
+    """
+    Return the memory used by an exactly-sized array of `length` items.
+    """
+    return sys.getsizeof(array(typecode)) + length * array(typecode).itemsize
+
+
+def _table_size(capacity):
+    """
+    Return the hash table size for `capacity` entries (power of two, load <= 0.5).
+    """
+    size = 1
+    while size < 2 * capacity:
+        size <<= 1
+    return size
+
+
+class CompactDictionary:
+    """
+    LZW dictionary stored in parallel `array` buffers.
+
+    Entry `code` represents the string of entry `prefix[code]` followed by the
+    byte `suffix[code]`. The 256 single-byte roots have a prefix of EMPTY.
+    Compressors look entries up through an open-addressing hash table that
+    holds codes; decompressors only need the prefix and suffix buffers and
+    can build the dictionary with `indexed=False`.
+
+    Parameters:
+        max_entries (int, optional): The maximum size of the dictionary.
+                                     If None, the buffers grow as needed.
+        indexed (bool): Whether to maintain the hash table for `lookup`.
+    """
+
+    def __init__(self, max_entries=None, indexed=True):
+        self.max_entries = max_entries
+        self.indexed = indexed
+        if max_entries is None:
+            capacity = DEFAULT_CAPACITY
+        else:
+            capacity = max(max_entries, ROOT_ENTRIES)
+        self.prefix = _zeroed_array('i', capacity, EMPTY)
+        self.suffix = _zeroed_array('B', capacity)
+        for i in range(ROOT_ENTRIES):
+            self.suffix[i] = i
+        self.size = ROOT_ENTRIES
+        self.table = None
+        if indexed:
+            self._build_table(capacity)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.prefix)
+
+    def can_add(self):
+        """
+        Return True if the dictionary limit still allows a new entry.
+        """
+        return self.max_entries is None or self.size < self.max_entries
+
+    def lookup(self, prefix, suffix):
+        """
+        Find the code of the entry `prefix` + `suffix`.
+
+        Parameters:
+            prefix (int): Code of the prefix entry.
+            suffix (int): The byte appended to the prefix.
+
+        Returns:
+            int: The code of the entry, or EMPTY if it is not in the dictionary.
+        """
+        table = self.table
+        mask = len(table) - 1
+        slot = (((prefix << 8) | suffix) * _HASH_MULTIPLIER >> 7) & mask
+        while True:
+            code = table[slot]
+            if code == EMPTY:
+                return EMPTY
+            if self.prefix[code] == prefix and self.suffix[code] == suffix:
+                return code
+            slot = (slot + 1) & mask
+
+    def add(self, prefix, suffix):
+        """
+        Add the entry `prefix` + `suffix` and return its code.
+
+        The caller is responsible for checking `can_add` first, mirroring the
+        dictionary limit check in `lzw_compress` and `lzw_decompress`.
+        """
+        code = self.size
+        if code == len(self.prefix):
+            self._grow()
+        self.prefix[code] = prefix
+        self.suffix[code] = suffix
+        self.size = code + 1
+        if self.table is not None:
+            self._insert(code)
+        return code
+
+    def expand(self, code):
+        """
+        Return the bytes represented by `code`.
+
+        Parameters:
+            code (int): A code present in the dictionary.
+
+        Returns:
+            bytes: The decoded entry.
+        """
+        prefix = self.prefix
+        suffix = self.suffix
+        out = bytearray()
+        while code != EMPTY:
+            out.append(suffix[code])
+            code = prefix[code]
+        out.reverse()
+        return bytes(out)
+
+    @property
+    def nbytes(self):
+        """
+        The exact number of bytes held by the dictionary buffers.
+        """
+        total = sys.getsizeof(self.prefix) + sys.getsizeof(self.suffix)
+        if self.table is not None:
+            total += sys.getsizeof(self.table)
+        return total
+
+    @staticmethod
+    def estimate_nbytes(max_entries, indexed=True):
+        """
+        Return the footprint of a dictionary limited to `max_entries`.
+
+        This is the value `nbytes` reports once such a dictionary is built,
+        so it can be used for capacity planning before compressing.
+
+        Parameters:
+            max_entries (int): The maximum size of the dictionary.
+            indexed (bool): Whether the hash table is included.
+
+        Returns:
+            int: Number of bytes.
+        """
+        capacity = max(max_entries, ROOT_ENTRIES)
+        total = _array_nbytes('i', capacity) + _array_nbytes('B', capacity)
+        if indexed:
+            total += _array_nbytes('i', _table_size(capacity))
+        return total
+
+    @classmethod
+    def from_entries(cls, prefix, suffix, max_entries=None, indexed=True):
+        """
+        Rebuild a dictionary from its saved `prefix` and `suffix` buffers.
+
+        Parameters:
+            prefix (array): Prefix codes of entries 0 .. size-1.
+            suffix (array): Suffix bytes of entries 0 .. size-1.
+            max_entries (int, optional): The maximum size of the dictionary.
+            indexed (bool): Whether to build the hash table for `lookup`.
+
+        Returns:
+            CompactDictionary: The dictionary, ready to continue encoding.
+        """
+        size = len(prefix)
+        if size != len(suffix) or size < ROOT_ENTRIES:
+            raise ValueError("Saved dictionary buffers are inconsistent")
+        if max_entries is not None and size > max(max_entries, ROOT_ENTRIES):
+            raise ValueError(f"Saved dictionary has {size} entries, more than its limit of {max_entries}")
+        dictionary = cls(max_entries, indexed=False)
+        while dictionary.capacity < size:
+            dictionary._grow()
+        dictionary.prefix[:size] = prefix
+        dictionary.suffix[:size] = suffix
+        dictionary.size = size
+        if indexed:
+            dictionary.indexed = True
+            dictionary._build_table(dictionary.capacity)
+        return dictionary
+
+    def _build_table(self, capacity):
+        self.table = _zeroed_array('i', _table_size(capacity), EMPTY)
+        # Roots are never looked up: a single byte is its own code.
+        for code in range(ROOT_ENTRIES, self.size):
+            self._insert(code)
+
+    def _insert(self, code):
+        table = self.table
+        mask = len(table) - 1
+        key = (self.prefix[code] << 8) | self.suffix[code]
+        slot = (key * _HASH_MULTIPLIER >> 7) & mask
+        while table[slot] != EMPTY:
+            slot = (slot + 1) & mask
+        table[slot] = code
+
+    def _grow(self):
+        extra = len(self.prefix)
+        self.prefix = self.prefix + _zeroed_array('i', extra, EMPTY)
+        self.suffix = self.suffix + _zeroed_array('B', extra)
+        if self.table is not None:
+            self._build_table(len(self.prefix))
@@ -1,22 +1,36 @@
 import os
+import shutil
 import sys
 import struct
 import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import openpyxl  # Ensure openpyxl is installed
-
-def lzw_compress(uncompressed, max_dict_size=None):
+from compact_dictionary import CompactDictionary, ROOT_ENTRIES
+from lzw_format import (DEFAULT_BLOCK_SIZE, DEFAULT_DEDUP_WINDOW_BITS, FLAG_DEDUP, FLAG_HUFFMAN,
+                        OperationCancelled, compress_file)
+from archive import ArchiveWriter
+from compression_cache import CompressionCache
+from results_store import ResultsStore
+from background import BackgroundJob, ProgressPanel
+from memory_budget import MemoryBudgetError, plan_compression, plan_dedup
+from auto_tune import OBJECTIVES, tune_file
+
+def lzw_compress(uncompressed, max_dict_size=None, compact=False):
     """
     Compress a string using the LZW algorithm.
 
     Parameters:
         uncompressed (str): The input string to compress.
         max_dict_size (int, optional): The maximum size of the dictionary.
+        compact (bool): Use the array-backed CompactDictionary instead of a
+                        dict of strings, keeping memory use predictable.
 
     Returns:
         List[int]: The list of output codes.
     """
+    if compact:
+        return lzw_compress_compact(uncompressed, max_dict_size)[0]
+
     # Initialize the dictionary with single-character strings.
     dict_size = 256
     dictionary = {chr(i): i for i in range(dict_size)}
@@ -38,6 +52,44 @@ def lzw_compress(uncompressed, max_dict_size=None):
         result.append(dictionary[w])
     return result
 
+def lzw_compress_compact(uncompressed, max_dict_size=None):
+    """
+    Compress a string using the LZW algorithm and a CompactDictionary.
+
+    Produces the same codes as `lzw_compress`.
+
+    Parameters:
+        uncompressed (str): The input string to compress.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+
+    Returns:
+        Tuple[List[int], CompactDictionary]: The list of output codes and the
+        final dictionary, whose `nbytes` gives its memory footprint.
+    """
+    dictionary = CompactDictionary(max_dict_size)
+    lookup = dictionary.lookup
+
+    w = -1  # Code of the current sequence
+    result = []
+    for c in uncompressed:
+        byte = ord(c)
+        if byte >= ROOT_ENTRIES:
+            raise ValueError(f"Character {c!r} is outside the 8-bit LZW alphabet")
+        if w < 0:
+            w = byte
+            continue
+        code = lookup(w, byte)
+        if code >= 0:
+            w = code
+        else:
+            result.append(w)
+            if dictionary.can_add():
+                dictionary.add(w, byte)
+            w = byte
+    if w >= 0:
+        result.append(w)
+    return result, dictionary
+
 def save_compressed_file(filename, compressed_data, code_bit_length):
     """
     Save compressed data to a file using bit-packing.
@@ -66,7 +118,9 @@ def save_compressed_file(filename, compressed_data, code_bit_length):
             byte = (buffer << (8 - bits_in_buffer)) & 0xFF
             f.write(bytes([byte]))
 
-def compress_files(file_paths, max_dict_size, code_bit_length):
+def compress_files(file_paths, max_dict_size, code_bit_length, memory_budget=None, archive=False,
+                   cache=None, entropy_coding=False, objective=None, dedup=False,
+                   export_excel=False, progress=None, cancel_event=None, messages=messagebox):
     """
     Compress multiple files using the LZW algorithm with specified parameters.
 
@@ -74,48 +128,166 @@ def compress_files(file_paths, max_dict_size, code_bit_length):
         file_paths (List[str]): A list of file paths to compress.
         max_dict_size (int): Maximum size of the dictionary.
         code_bit_length (int): Number of bits used to represent each code.
+        memory_budget (int, optional): Maximum bytes for the dictionary and
+                                       buffers. Files are then streamed in
+                                       chunks, and without a dictionary size
+                                       the largest one that fits is used.
+        archive (bool): Pack all files into a single `.lza` archive with a
+                        central directory instead of one `.lzw` per file.
+        cache (CompressionCache, optional): Reuse the outputs and result rows
+                                            of unchanged inputs instead of
+                                            recompressing them. Not used in
+                                            archive mode.
+        entropy_coding (bool): Huffman-code the LZW codes of each block. The
+                               stage is recorded in the header and undone
+                               by the decompressor.
+        objective (str, optional): Tune the code bit length and dictionary
+                                   size of each file from a sample of it,
+                                   for 'ratio', 'speed' or 'memory' (within
+                                   `memory_budget`). `max_dict_size` and
+                                   `code_bit_length` are then ignored.
+        dedup (bool): Replace chunks that repeat earlier ones with
+                      references before LZW, for inputs with long
+                      repeated regions. References stay within one
+                      file or archive member. With `memory_budget`, the
+                      dedup window is sized so that its index fits.
+        export_excel (bool): Also write the run's results to an Excel file in
+                             the output directory.
+        progress (callable, optional): Called with (bytes done, total bytes)
+                                       as the files are compressed.
+        cancel_event (threading.Event, optional): When set, the current file's
+                                                  partial output is removed and
+                                                  no further files are processed.
+        messages (module, optional): Provides showinfo/showwarning/showerror;
+                                     a BackgroundJob when run off the Tk thread.
+
+    Returns:
+        List[dict]: The result rows of the files compressed.
     """
     # Create a list to store compression results
     results = []
 
+    # Fit the dictionary, the dedup index and the streaming chunk into the memory budget
+    plan = None
+    dedup_window_bits = DEFAULT_DEDUP_WINDOW_BITS
+    try:
+        if memory_budget is not None and objective is None:
+            plan = plan_compression(memory_budget, code_bit_length, max_dict_size, dedup, entropy_coding)
+            max_dict_size = plan.max_dict_size
+            if dedup:
+                dedup_window_bits = plan.dedup_window_bits
+        elif memory_budget is not None and dedup:
+            # The window does not depend on the settings tuned per file
+            dedup_window_bits, _ = plan_dedup(memory_budget)
+    except MemoryBudgetError as e:
+        messages.showerror("Memory Budget Error", str(e))
+        return results
+
     # Create output directory name based on parameters
-    dict_size_str = f"dict{max_dict_size}" if max_dict_size else "nodictlimit"
-    code_length_str = f"code{code_bit_length}bit"
+    if objective is not None:
+        # Settings differ per file; each output records its own in the header
+        dict_size_str = "auto"
+        code_length_str = objective
+    else:
+        dict_size_str = f"dict{max_dict_size}" if max_dict_size else "nodictlimit"
+        code_length_str = f"code{code_bit_length}bit"
     output_dir_name = f"output_{dict_size_str}_{code_length_str}"
     output_dir_path = os.path.join(os.getcwd(), output_dir_name)
 
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir_path, exist_ok=True)
 
+    # In archive mode every file becomes a member of one archive
+    archive_writer = None
+    if archive:
+        # Members are named by their path below the inputs' common parent, so
+        # files of the same name in different directories stay apart
+        input_dirs = [os.path.dirname(os.path.abspath(path)) for path in file_paths if os.path.isfile(path)]
+        archive_root = os.path.commonpath(input_dirs) if input_dirs else os.getcwd()
+        archive_file_name = f"Compressed_Archive_{dict_size_str}_{code_length_str}.lza"
+        archive_writer = ArchiveWriter(os.path.join(output_dir_path, archive_file_name))
+
+    # Progress is reported over the total size of all inputs
+    total_bytes = sum(os.path.getsize(path) for path in file_paths if os.path.isfile(path))
+    done_bytes = 0
+    cancelled = False
+    failed_files = []
+
+    def file_progress(file_bytes):
+        if progress is not None:
+            progress(done_bytes + file_bytes, total_bytes)
+
+    block_size = plan.chunk_size if plan else DEFAULT_BLOCK_SIZE
+    flags = (FLAG_HUFFMAN if entropy_coding else 0) | (FLAG_DEDUP if dedup else 0)
     for input_file in file_paths:
+        if cancel_event is not None and cancel_event.is_set():
+            cancelled = True
+            break
+
         # Ensure the file exists
         if not os.path.isfile(input_file):
-            messagebox.showwarning("File Not Found", f"File not found: {input_file}")
+            messages.showwarning("File Not Found", f"File not found: {input_file}")
             continue
 
-        # Read the input file
-        try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = f.read()
-        except Exception as e:
-            messagebox.showerror("Read Error", f"Error reading '{input_file}': {e}")
-            continue
-
-        # Compress the data
-        compressed = lzw_compress(data, max_dict_size)
+        # Pick this file's settings from a sample of it
+        if objective is not None:
+            try:
+                chosen = tune_file(input_file, objective, memory_budget, dedup, entropy_coding)
+                max_dict_size, code_bit_length = chosen.max_dict_size, chosen.code_bit_length
+                if memory_budget is not None:
+                    block_size = plan_compression(memory_budget, code_bit_length, max_dict_size,
+                                                  dedup, entropy_coding).chunk_size
+            except (OSError, ValueError) as e:
+                messages.showerror("Tuning Error", f"Error tuning '{input_file}': {e}")
+                continue
 
         # Generate the output file name (without parameters, since directory includes them)
         base_name = os.path.basename(input_file)
         name, _ = os.path.splitext(base_name)
-        compressed_file_name = f"{name}.lzw"
-        compressed_file = os.path.join(output_dir_path, compressed_file_name)
-
-        # Save the compressed data
+        if archive_writer is not None:
+            # Archive members are reported as <archive>:<member name>
+            base_name = os.path.relpath(os.path.abspath(input_file), archive_root).replace(os.sep, '/')
+            compressed_file_name = f"{archive_file_name}:{base_name}"
+            compressed_file = compressed_file_name
+        else:
+            compressed_file_name = f"{name}.lzw"
+            compressed_file = os.path.join(output_dir_path, compressed_file_name)
+
+        # Reuse the output of an earlier run if the input has not changed
+        cache_key = None
+        if cache is not None and archive_writer is None:
+            try:
+                cache_key, cached_file, cached_result = cache.lookup(input_file, max_dict_size,
+                                                                     code_bit_length, flags)
+                if cached_file is not None:
+                    shutil.copyfile(cached_file, compressed_file)
+                    cached_result['File Name'] = base_name
+                    cached_result['Compressed File'] = compressed_file_name
+                    results.append(cached_result)
+                    done_bytes += os.path.getsize(input_file)
+                    file_progress(0)
+                    continue
+            except OSError as e:
+                messages.showerror("Cache Error", f"Error using the cache for '{input_file}': {e}")
+                cache_key = None
+
+        # Compress the file into checksummed blocks, streaming it from disk
         try:
-            save_compressed_file(compressed_file, compressed, code_bit_length)
+            if archive_writer is not None:
+                member = archive_writer.add_file(input_file, code_bit_length, max_dict_size,
+                                                 arcname=base_name, block_size=block_size, flags=flags,
+                                                 progress=file_progress, cancel_event=cancel_event,
+                                                 dedup_window_bits=dedup_window_bits,
+                                                 compact=memory_budget is not None)
+                compressed_size = member.compressed_size
+            else:
+                compress_file(input_file, compressed_file, code_bit_length, max_dict_size, block_size,
+                              flags, file_progress, cancel_event, dedup_window_bits,
+                              memory_budget is not None)
+                compressed_size = os.path.getsize(compressed_file)
             # Get file sizes
             original_size = os.path.getsize(input_file)
-            compressed_size = os.path.getsize(compressed_file)
+            done_bytes += original_size
             compression_ratio = compressed_size / original_size if original_size != 0 else 0
             compression_performance = 100 * (1 - compression_ratio)
             # Add the results to the list
@@ -129,23 +301,74 @@ def compress_files(file_paths, max_dict_size, code_bit_length):
                 'Max Dictionary Size': max_dict_size if max_dict_size else 'No Limit',
                 'Code Bit Length': code_bit_length
             })
-            messagebox.showinfo("Success",
+            if cache_key is not None:
+                cache.store(cache_key, compressed_file, results[-1])
+            if archive_writer is not None:
+                continue
+            messages.showinfo("Success",
                                 f"Compressed '{input_file}' to '{compressed_file}'\n"
                                 f"Original Size: {original_size} bytes\n"
                                 f"Compressed Size: {compressed_size} bytes\n"
                                 f"Compression Ratio: {compression_ratio:.4f}\n"
                                 f"Compression Performance: {compression_performance:.2f}%")
+        except OperationCancelled:
+            # compress_file has already removed the partial output
+            cancelled = True
+            break
         except Exception as e:
-            messagebox.showerror("Write Error", f"Error writing '{compressed_file}': {e}")
+            failed_files.append(base_name)
+            messages.showerror("Write Error", f"Error writing '{compressed_file}': {e}")
+
+    if cache is not None:
+        cache.save()
 
-    # After processing all files, save the results to an Excel file in the output directory
+    if archive_writer is not None and cancelled:
+        # A partial archive is of no use; members already written go with it
+        archive_writer.discard()
+        results = []
+    elif archive_writer is not None:
+        try:
+            archive_writer.close()
+            archive_path = os.path.join(output_dir_path, archive_file_name)
+            if failed_files:
+                # The failed members were cut off; the archive holds only the others
+                messages.showwarning("Archive Incomplete",
+                                     f"Compressed {len(archive_writer.members)} files into '{archive_path}'\n"
+                                     f"Failed and left out: {', '.join(failed_files)}")
+            else:
+                messages.showinfo("Success",
+                                    f"Compressed {len(archive_writer.members)} files into '{archive_path}'")
+        except Exception as e:
+            messages.showerror("Write Error", f"Error writing '{archive_file_name}': {e}")
+            return results
+
+    # After processing all files, append the results to the results store
     if results:
-        save_results_to_excel(results, output_dir_path, dict_size_str, code_length_str)
+        try:
+            with ResultsStore() as store:
+                store.append_results(results)
+                if export_excel:
+                    excel_file_path = save_results_to_excel(results, output_dir_path,
+                                                            dict_size_str, code_length_str, messages)
+                    # The rows are already stored; keep retrieve.py from importing them again
+                    if excel_file_path:
+                        store.mark_imported(excel_file_path)
+        except Exception as e:
+            messages.showerror("Results Store Error", f"Error recording results: {e}")
 
-def save_results_to_excel(results, output_dir_path, dict_size_str, code_length_str):
+    if cancelled:
+        messages.showwarning("Cancelled", f"Compression cancelled after {len(results)} files.")
+    return results
+
+def save_results_to_excel(results, output_dir_path, dict_size_str, code_length_str, messages=messagebox):
     """
     Save the compression results to an Excel file in the output directory.
+
+    Returns:
+        str: The path of the Excel file, or None if it could not be saved.
     """
+    import openpyxl  # Only needed for the optional Excel export
+
     # Create a new Excel workbook
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -184,31 +407,51 @@ def save_results_to_excel(results, output_dir_path, dict_size_str, code_length_s
     # Save the workbook
     try:
         wb.save(excel_file_path)
-        messagebox.showinfo("Excel File Saved", f"Results saved to '{excel_file_path}'")
+        messages.showinfo("Excel File Saved", f"Results saved to '{excel_file_path}'")
+        return excel_file_path
     except Exception as e:
-        messagebox.showerror("Excel Save Error", f"Error saving Excel file: {e}")
+        messages.showerror("Excel Save Error", f"Error saving Excel file: {e}")
+        return None
 
-def select_files(entry_dict_size, entry_code_length):
+def select_files(entry_dict_size, entry_code_length, entry_memory_budget, archive_var, cache_var,
+                 entropy_var, tuning_var, dedup_var, progress_panel, select_button):
     """
     Open a file dialog to select multiple files for compression and get parameters.
 
     Parameters:
         entry_dict_size (tk.Entry): Entry widget for max dictionary size.
         entry_code_length (tk.Entry): Entry widget for code bit length.
+        entry_memory_budget (tk.Entry): Entry widget for the memory budget in MB.
+        archive_var (tk.BooleanVar): Whether to pack the files into one archive.
+        cache_var (tk.BooleanVar): Whether to reuse cached outputs of unchanged files.
+        entropy_var (tk.BooleanVar): Whether to Huffman-code the LZW codes.
+        tuning_var (tk.StringVar): 'manual', or the objective used to tune
+                                   each file's parameters automatically.
+        dedup_var (tk.BooleanVar): Whether to deduplicate repeated chunks.
+        progress_panel (ProgressPanel): Shows progress and offers cancellation.
+        select_button (tk.Button): Disabled while compression runs.
     """
+    # In auto mode the dictionary size and code bit length are tuned per file
+    objective = tuning_var.get() if tuning_var.get() in OBJECTIVES else None
+
     # Get parameters
     try:
-        max_dict_size = int(entry_dict_size.get()) if entry_dict_size.get() else None
-        code_bit_length = int(entry_code_length.get())
+        max_dict_size = int(entry_dict_size.get()) if entry_dict_size.get() and objective is None else None
+        code_bit_length = int(entry_code_length.get()) if objective is None else None
+        memory_budget = int(float(entry_memory_budget.get()) * 1024 * 1024) if entry_memory_budget.get() else None
     except ValueError:
         messagebox.showerror("Invalid Input", "Please enter valid numbers for the parameters.")
         return
 
-    if code_bit_length < 9 or code_bit_length > 24:
+    if objective == 'memory' and memory_budget is None:
+        messagebox.showerror("Invalid Parameters", "Tuning for memory needs a memory budget.")
+        return
+
+    if code_bit_length is not None and (code_bit_length < 9 or code_bit_length > 24):
         messagebox.showerror("Invalid Code Bit Length", "Code bit length must be between 9 and 24.")
         return
 
-    if max_dict_size and max_dict_size > (1 << code_bit_length):
+    if code_bit_length is not None and max_dict_size and max_dict_size > (1 << code_bit_length):
         messagebox.showerror("Invalid Parameters",
                              "Max Dictionary Size cannot exceed 2^Code Bit Length.")
         return
@@ -216,7 +459,18 @@ def select_files(entry_dict_size, entry_code_length):
     file_paths = filedialog.askopenfilenames(title="Select Files to Compress",
                                              filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
     if file_paths:
-        compress_files(file_paths, max_dict_size, code_bit_length)
+        cache = CompressionCache() if cache_var.get() else None
+        # Compress on a worker thread so the window stays responsive
+        job = BackgroundJob(compress_files, file_paths, max_dict_size, code_bit_length,
+                            memory_budget, archive_var.get(), cache, entropy_var.get(), objective,
+                            dedup_var.get())
+        job.kwargs.update(progress=job.report_progress, cancel_event=job.cancel_event, messages=job)
+
+        def done(results, error):
+            if error is not None:
+                messagebox.showerror("Compression Error", f"An error occurred while compressing: {error}")
+
+        progress_panel.run(job, done, busy_widgets=[select_button])
 
 def create_ui():
     """
@@ -227,7 +481,7 @@ def create_ui():
 
     # Set window size and position
     window_width = 400
-    window_height = 300
+    window_height = 620
     screen_width = root.winfo_screenwidth()
     screen_height = root.winfo_screenheight()
     x_position = (screen_width // 2) - (window_width // 2)
@@ -258,10 +512,50 @@ def create_ui():
     entry_code_length.insert(0, "12")  # Default value
     entry_code_length.grid(row=1, column=1, padx=5, pady=5)
 
+    # Memory Budget
+    label_memory_budget = tk.Label(frame_params, text="Memory Budget in MB (Optional):")
+    label_memory_budget.grid(row=2, column=0, sticky='e', padx=5, pady=5)
+    entry_memory_budget = tk.Entry(frame_params)
+    entry_memory_budget.grid(row=2, column=1, padx=5, pady=5)
+
+    # Archive mode
+    archive_var = tk.BooleanVar(value=False)
+    check_archive = tk.Checkbutton(frame_params, text="Pack into a single archive", variable=archive_var)
+    check_archive.grid(row=3, column=0, columnspan=2, pady=5)
+
+    # Compression cache
+    cache_var = tk.BooleanVar(value=False)
+    check_cache = tk.Checkbutton(frame_params, text="Reuse cached outputs for unchanged files", variable=cache_var)
+    check_cache.grid(row=4, column=0, columnspan=2, pady=5)
+
+    # Entropy coding stage
+    entropy_var = tk.BooleanVar(value=False)
+    check_entropy = tk.Checkbutton(frame_params, text="Entropy-code the LZW codes (Huffman)", variable=entropy_var)
+    check_entropy.grid(row=5, column=0, columnspan=2, pady=5)
+
+    # Automatic parameter tuning
+    label_tuning = tk.Label(frame_params, text="Parameter Tuning:")
+    label_tuning.grid(row=6, column=0, sticky='e', padx=5, pady=5)
+    tuning_var = tk.StringVar(value='manual')
+    option_tuning = tk.OptionMenu(frame_params, tuning_var, 'manual', *OBJECTIVES)
+    option_tuning.grid(row=6, column=1, sticky='w', padx=5, pady=5)
+
+    # Deduplication pre-pass
+    dedup_var = tk.BooleanVar(value=False)
+    check_dedup = tk.Checkbutton(frame_params, text="Deduplicate long repeated regions", variable=dedup_var)
+    check_dedup.grid(row=7, column=0, columnspan=2, pady=5)
+
     # Create a button to select files
     select_button = tk.Button(root, text="Select Files to Compress",
-                              command=lambda: select_files(entry_dict_size, entry_code_length))
-    select_button.pack(pady=20)
+                              command=lambda: select_files(entry_dict_size, entry_code_length,
+                                                          entry_memory_budget, archive_var, cache_var,
+                                                          entropy_var, tuning_var, dedup_var,
+                                                          progress_panel, select_button))
+    select_button.pack(pady=10)
+
+    # Progress, throughput and cancellation of the running job
+    progress_panel = ProgressPanel(root)
+    progress_panel.pack(pady=5)
 
     # Start the main event loop
     root.mainloop()
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Default location and size limit of the cache.
+DEFAULT_CACHE_DIR = '.lzw_cache'
+DEFAULT_MAX_BYTES = 1 << 30
+
+INDEX_FILE_NAME = 'index.json'
+
+# Read size used when hashing input files.
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(path):
+    """
+    Return the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompressionCache:
+    """
+    On-disk cache of compressed outputs keyed by input content and parameters.
+
+    Entries are keyed by the SHA-256 of the input plus
+    (max_dict_size, code_bit_length, stage flags) and hold the `.lzw` output and the
+    result row of the run that produced it. Files whose path, mtime and size
+    are unchanged since they were last hashed are not hashed again. When the
+    cached outputs exceed `max_bytes`, the least recently used are evicted.
+
+    Parameters:
+        cache_dir (str): Directory holding the cached outputs and the index.
+        max_bytes (int): Maximum total size of the cached outputs.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        self.entries = {}  # cache key -> {'file', 'size', 'result', 'last_used'}
+        self.stats = {}    # absolute path -> {'mtime_ns', 'size', 'sha256'}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.entries = index.get('entries', {})
+            self.stats = index.get('stats', {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+
+    def file_hash(self, path):
+        """
+        Return the content hash of `path`, reusing the recorded hash when its
+        mtime and size have not changed.
+        """
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        known = self.stats.get(key)
+        if known and known['mtime_ns'] == st.st_mtime_ns and known['size'] == st.st_size:
+            return known['sha256']
+        sha256 = content_hash(path)
+        self.stats[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': sha256}
+        return sha256
+
+    @staticmethod
+    def make_key(sha256, max_dict_size, code_bit_length, flags=0):
+        key = f"{sha256}_{max_dict_size or 'nolimit'}_{code_bit_length}"
+        return f"{key}_f{flags}" if flags else key
+
+    def lookup(self, input_file, max_dict_size, code_bit_length, flags=0):
+        """
+        Look up the compressed output of `input_file` for the given parameters.
+
+        Parameters:
+            input_file (str): The file to compress.
+            max_dict_size (int): Maximum size of the dictionary.
+            code_bit_length (int): Number of bits used to represent each code.
+            flags (int): Stage flags of the block format.
+
+        Returns:
+            Tuple[str, str, dict]: The cache key, then the cached `.lzw` path
+            and result row, or None for both on a miss.
+        """
+        key = self.make_key(self.file_hash(input_file), max_dict_size, code_bit_length, flags)
+        entry = self.entries.get(key)
+        if entry is None:
+            return key, None, None
+        cached_file = os.path.join(self.cache_dir, entry['file'])
+        if not os.path.exists(cached_file):
+            del self.entries[key]
+            return key, None, None
+        entry['last_used'] = time.time()
+        return key, cached_file, dict(entry['result'])
+
+    def store(self, key, compressed_file, result):
+        """
+        Add a compressed output and its result row, evicting old entries if
+        the cache grows beyond `max_bytes`.
+
+        Parameters:
+            key (str): The key returned by `lookup`.
+            compressed_file (str): The `.lzw` file produced for the key.
+            result (dict): The result row of that compression.
+        """
+        file_name = f"{key}.lzw"
+        shutil.copyfile(compressed_file, os.path.join(self.cache_dir, file_name))
+        self.entries[key] = {
+            'file': file_name,
+            'size': os.path.getsize(compressed_file),
+            'result': result,
+            'last_used': time.time(),
+        }
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+        """
+        total = sum(entry['size'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries.pop(key)
+            total -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except FileNotFoundError:
+                pass
+
+    def save(self):
+        """
+        Write the index atomically.
+        """
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries, 'stats': self.stats}, f)
+        os.replace(tmp_path, self.index_path)
@@ -1,10 +1,22 @@
 import os
+import re
 import sys
 import struct
+import time
 import tkinter as tk
+import queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Manager
 from tkinter import filedialog, messagebox
+from compact_dictionary import CompactDictionary
+from lzw_codec import decompress_file_streaming
+from memory_budget import plan_decompression
+from archive import extract_all, is_archive, verify_archive
+from lzw_format import (DEFAULT_CHUNK_SIZE, FLAG_HUFFMAN, OperationCancelled, decompress_file,
+                        is_block_format, read_file_header, scan_blocks, verify_file)
+from background import BackgroundJob, ProgressPanel
 
-def lzw_decompress(compressed_data, code_bit_length, max_dict_size=None):
+def lzw_decompress(compressed_data, code_bit_length, max_dict_size=None, compact=False):
     """
     Decompress a list of output codes to a string using the LZW algorithm.
 
@@ -13,10 +25,15 @@ def lzw_decompress(compressed_data, code_bit_length, max_dict_size=None):
         code_bit_length (int): Number of bits used to represent each code.
         max_dict_size (int, optional): The maximum size of the dictionary.
                                         If None, the dictionary can grow indefinitely.
+        compact (bool): Use the array-backed CompactDictionary instead of a
+                        dict of strings, keeping memory use predictable.
 
     Returns:
         str: The decompressed string.
     """
+    if compact:
+        return lzw_decompress_compact(compressed_data, max_dict_size)[0]
+
     # Reconstruct the dictionary.
     dict_size = 256
     max_code = (1 << code_bit_length) - 1
@@ -43,6 +60,46 @@ def lzw_decompress(compressed_data, code_bit_length, max_dict_size=None):
         w = entry
     return ''.join(result)
 
+def lzw_decompress_compact(compressed_data, max_dict_size=None):
+    """
+    Decompress a list of codes using the LZW algorithm and a CompactDictionary.
+
+    Unlike `lzw_decompress`, the input list is left unmodified.
+
+    Parameters:
+        compressed_data (List[int]): The list of compressed codes.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+
+    Returns:
+        Tuple[str, CompactDictionary]: The decompressed string and the final
+        dictionary, whose `nbytes` gives its memory footprint.
+    """
+    dictionary = CompactDictionary(max_dict_size, indexed=False)
+    if not compressed_data:
+        return '', dictionary
+
+    result = []
+    prev = compressed_data[0]
+    if prev >= len(dictionary):
+        raise ValueError(f"Bad compressed k: {prev}")
+    w = dictionary.expand(prev)
+    result.append(w)
+    for k in compressed_data[1:]:
+        if k < len(dictionary):
+            entry = dictionary.expand(k)
+        elif k == len(dictionary):
+            entry = w + w[:1]
+        else:
+            raise ValueError(f"Bad compressed k: {k}")
+        result.append(entry)
+
+        if dictionary.can_add():
+            dictionary.add(prev, entry[0])
+
+        prev = k
+        w = entry
+    return b''.join(result).decode('latin-1'), dictionary
+
 def read_compressed_file(filename, code_bit_length):
     """
     Read compressed data from a file using bit-packing.
@@ -72,60 +129,331 @@ def read_compressed_file(filename, code_bit_length):
             byte = f.read(1)
     return compressed_data
 
-def decompress_files(file_paths):
+def decompress_single_file(compressed_file, memory_budget=None, cancel_event=None, progress=None):
     """
-    Decompress multiple files using the LZW algorithm.
+    Decompress one `.lzw` file, or extract one `.lza` archive, next to it.
+
+    Parameters:
+        compressed_file (str): The compressed file path.
+        memory_budget (int, optional): Maximum bytes for the dictionary and
+                                       buffers. Files are then streamed in
+                                       chunks.
+        cancel_event (threading.Event, optional): Aborts a block-format file
+                                                  or an archive and removes
+                                                  its partial output.
+        progress (callable, optional): Called with the number of compressed
+                                       bytes processed as a block-format
+                                       file or an archive is decoded.
+
+    Returns:
+        Tuple[str, int]: The output path and the number of original bytes.
+    """
+    dir_path = os.path.dirname(compressed_file)
+    base_name = os.path.basename(compressed_file)
+    name, _ = os.path.splitext(base_name)
+    decompressed_file_name = f"{name}_decompressed.txt"
+    decompressed_file_path = os.path.join(dir_path, decompressed_file_name)
+
+    if is_archive(compressed_file):
+        # Extract every member next to the archive
+        output_dir = os.path.join(dir_path, f"{name}_extracted")
+        extracted = extract_all(compressed_file, output_dir, progress, cancel_event, memory_budget)
+        return output_dir, sum(os.path.getsize(path) for path in extracted)
+
+    if is_block_format(compressed_file):
+        # Parameters are recorded in the header and every block is checksummed
+        chunk_size = DEFAULT_CHUNK_SIZE
+        file_progress = None
+        if memory_budget is not None or progress is not None:
+            original_size, largest = scan_blocks(compressed_file)
+        if memory_budget is not None:
+            header = read_file_header(compressed_file)
+            # Only blocks without stage flags are streamed piece by piece
+            block_size = largest if header.flags else None
+            plan = plan_decompression(memory_budget, header.code_bit_length, header.max_dict_size,
+                                      block_size, bool(header.flags & FLAG_HUFFMAN))
+            chunk_size = plan.chunk_size
+        if progress is not None:
+            # Scale the original bytes written to the compressed size
+            compressed_size = os.path.getsize(compressed_file)
+
+            def file_progress(written):
+                progress(compressed_size * written // max(original_size, 1))
+        return decompressed_file_path, decompress_file(compressed_file, decompressed_file_path, chunk_size,
+                                                       file_progress, cancel_event,
+                                                       memory_budget is not None)
+
+    # Legacy file: extract parameters from the directory name
+    dir_name = os.path.basename(dir_path)
+    # Expected format: output_dict<max_dict_size>_code<code_bit_length>bit
+    match = re.match(r'output_(dict\d+|nodictlimit)_code(\d+)bit', dir_name)
+    if not match:
+        raise ValueError(f"Cannot extract parameters from directory name: {dir_name}")
+    dict_size_str = match.group(1)
+    code_length_str = match.group(2)
+
+    # Convert parameters to appropriate types
+    max_dict_size = None if dict_size_str == 'nodictlimit' else int(dict_size_str.replace('dict', ''))
+    code_bit_length = int(code_length_str)
+
+    if memory_budget is not None:
+        # Stream within the budget; a file without a dictionary limit
+        # can still hold at most every code of its bit length
+        plan = plan_decompression(memory_budget, code_bit_length, max_dict_size)
+        dict_limit = max_dict_size if max_dict_size else 1 << code_bit_length
+        decompress_file_streaming(compressed_file, decompressed_file_path, code_bit_length,
+                                  dict_limit, plan.chunk_size)
+    else:
+        # Read the compressed data
+        compressed_data = read_compressed_file(compressed_file, code_bit_length)
+
+        # Decompress the data
+        decompressed_data = lzw_decompress(compressed_data, code_bit_length, max_dict_size)
+
+        # Save the decompressed file
+        with open(decompressed_file_path, 'w', encoding='utf-8') as f:
+            f.write(decompressed_data)
+    return decompressed_file_path, os.path.getsize(decompressed_file_path)
+
+def _new_report(compressed_file, status='OK'):
+    return {
+        'Compressed File': compressed_file,
+        'Output': None,
+        'Status': status,
+        'Error': None,
+        'Compressed Size (bytes)': None,
+        'Original Size (bytes)': None,
+        'Seconds': None,
+        'MB/s': None,
+    }
+
+class _QueueProgress:
+    """
+    Progress callback of a worker process: puts (file index, bytes done)
+    on a Manager queue that the parent drains.
+    """
+
+    def __init__(self, updates, index):
+        self.updates = updates
+        self.index = index
+
+    def __call__(self, done):
+        self.updates.put((self.index, done))
+
+def _decompress_report(args, cancel_event=None, progress=None):
+    """
+    Decompress one file in a worker process and describe the outcome.
+
+    Errors are reported in the row rather than raised, so one bad file does
+    not stop the batch.
+    """
+    compressed_file, memory_budget = args
+    report = _new_report(compressed_file)
+    start = time.perf_counter()
+    try:
+        report['Compressed Size (bytes)'] = os.path.getsize(compressed_file)
+        output, original_size = decompress_single_file(compressed_file, memory_budget, cancel_event,
+                                                       progress)
+        elapsed = time.perf_counter() - start
+        report['Output'] = output
+        report['Original Size (bytes)'] = original_size
+        report['Seconds'] = elapsed
+        report['MB/s'] = original_size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    except OperationCancelled:
+        report['Status'] = 'Cancelled'
+        report['Seconds'] = time.perf_counter() - start
+    except Exception as e:
+        report['Status'] = 'Error'
+        report['Error'] = f"{type(e).__name__}: {e}"
+        report['Seconds'] = time.perf_counter() - start
+    return report
+
+def batch_decompress(file_paths, workers=None, memory_budget=None, progress=None, cancel_event=None):
+    """
+    Decompress multiple files in parallel worker processes.
 
     Parameters:
         file_paths (List[str]): A list of compressed file paths to decompress.
+        workers (int, optional): Number of worker processes; defaults to the
+                                 number of CPUs. 1 decompresses in this process.
+        memory_budget (int, optional): Memory budget applied to each worker.
+        progress (callable, optional): Called with (compressed bytes done,
+                                       total compressed bytes) as blocks are
+                                       decoded, in workers too.
+        cancel_event (threading.Event, optional): When set, files not yet
+                                                  started are skipped and
+                                                  running ones, in workers
+                                                  too, are aborted with their
+                                                  partial output removed.
+
+    Returns:
+        List[dict]: One report per file, in the order of `file_paths`, with
+        status, sizes, elapsed seconds and MB/s of original data.
     """
-    for compressed_file in file_paths:
-        try:
-            # Extract parameters from the directory name
-            dir_path = os.path.dirname(compressed_file)
-            dir_name = os.path.basename(dir_path)
-            # Expected format: output_dict<max_dict_size>_code<code_bit_length>bit
-            import re
-            match = re.match(r'output_(dict\d+|nodictlimit)_code(\d+)bit', dir_name)
-            if match:
-                dict_size_str = match.group(1)
-                code_length_str = match.group(2)
-
-                # Convert parameters to appropriate types
-                max_dict_size = None if dict_size_str == 'nodictlimit' else int(dict_size_str.replace('dict', ''))
-                code_bit_length = int(code_length_str)
-            else:
-                messagebox.showerror("Error", f"Cannot extract parameters from directory name: {dir_name}")
-                continue
+    jobs = [(path, memory_budget) for path in file_paths]
+    sizes = [os.path.getsize(path) if os.path.isfile(path) else 0 for path in file_paths]
+    total = sum(sizes)
+    done = 0
+    reports = [None] * len(jobs)
+
+    if workers == 1 or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            file_progress = None
+            if progress is not None:
+                def file_progress(file_done):
+                    progress(done + file_done, total)
+            reports[i] = _decompress_report(job, cancel_event, file_progress)
+            done += sizes[i]
+            if progress is not None:
+                progress(done, total)
+    else:
+        # Workers report progress through a queue and watch a shared cancel event
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+            updates = manager.Queue()
+            worker_cancel = manager.Event()
+            futures = {executor.submit(_decompress_report, job, worker_cancel, _QueueProgress(updates, i)): i
+                       for i, job in enumerate(jobs)}
+            running = {}  # file index -> compressed bytes done
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                while True:
+                    try:
+                        i, file_done = updates.get_nowait()
+                    except queue.Empty:
+                        break
+                    if reports[i] is None:
+                        running[i] = file_done
+                for future in finished:
+                    if future.cancelled():
+                        continue
+                    i = futures[future]
+                    reports[i] = future.result()
+                    running.pop(i, None)
+                    done += sizes[i]
+                if progress is not None:
+                    progress(done + sum(running.values()), total)
+                if cancel_event is not None and cancel_event.is_set() and not worker_cancel.is_set():
+                    # Running files are aborted; the rest never start
+                    worker_cancel.set()
+                    for future in pending:
+                        future.cancel()
+
+    # Results are placed by index, so the reports follow the input order
+    return [report if report is not None else _new_report(path, 'Cancelled')
+            for path, report in zip(file_paths, reports)]
 
-            # Read the compressed data
-            compressed_data = read_compressed_file(compressed_file, code_bit_length)
+def show_decompression_summary(reports):
+    """
+    Show one message box summarising the per-file reports of a batch.
+    """
+    lines = []
+    for report in reports:
+        if report['Status'] == 'OK':
+            lines.append(f"OK      {report['Compressed File']} -> {report['Output']} "
+                         f"({report['Original Size (bytes)']} bytes, {report['MB/s']:.2f} MB/s)")
+        elif report['Status'] == 'Cancelled':
+            lines.append(f"SKIPPED {report['Compressed File']}: cancelled")
+        else:
+            lines.append(f"FAILED  {report['Compressed File']}: {report['Error']}")
+    succeeded = sum(report['Status'] == 'OK' for report in reports)
+    summary = f"Decompressed {succeeded} of {len(reports)} files.\n\n" + "\n".join(lines)
+    if succeeded < len(reports):
+        messagebox.showerror("Decompression Results", summary)
+    else:
+        messagebox.showinfo("Decompression Results", summary)
 
-            # Decompress the data
-            decompressed_data = lzw_decompress(compressed_data, code_bit_length, max_dict_size)
+def decompress_files(file_paths, memory_budget=None, workers=None):
+    """
+    Decompress multiple files using the LZW algorithm.
 
-            # Save the decompressed file
-            base_name = os.path.basename(compressed_file)
-            name, _ = os.path.splitext(base_name)
-            decompressed_file_name = f"{name}_decompressed.txt"
-            decompressed_file_path = os.path.join(dir_path, decompressed_file_name)
+    Parameters:
+        file_paths (List[str]): A list of compressed file paths to decompress.
+        memory_budget (int, optional): Maximum bytes for the dictionary and
+                                       buffers. Files are then streamed in
+                                       chunks.
+        workers (int, optional): Number of worker processes.
 
-            with open(decompressed_file_path, 'w', encoding='utf-8') as f:
-                f.write(decompressed_data)
+    Returns:
+        List[dict]: The per-file reports from `batch_decompress`.
+    """
+    reports = batch_decompress(file_paths, workers, memory_budget)
+    show_decompression_summary(reports)
+    return reports
+
+def verify_files(file_paths):
+    """
+    Check the block checksums of multiple compressed files without writing
+    any output. Archives also have their directory checksum checked.
 
-            messagebox.showinfo("Success",
-                                f"Decompressed '{compressed_file}' to '{decompressed_file_path}'")
+    Parameters:
+        file_paths (List[str]): A list of compressed file paths to verify.
+    """
+    lines = []
+    for compressed_file in file_paths:
+        try:
+            if is_archive(compressed_file):
+                report = verify_archive(compressed_file)
+                lines.append(f"OK      {compressed_file} ({report['Members']} members, {report['Blocks']} blocks, "
+                             f"{report['Original Size (bytes)']} bytes)")
+                continue
+            if not is_block_format(compressed_file):
+                lines.append(f"SKIPPED {compressed_file}: legacy file without checksums")
+                continue
+            report = verify_file(compressed_file)
+            lines.append(f"OK      {compressed_file} ({report['Blocks']} blocks, "
+                         f"{report['Original Size (bytes)']} bytes)")
         except Exception as e:
-            messagebox.showerror("Decompression Error", f"An error occurred while decompressing '{compressed_file}': {e}")
+            lines.append(f"FAILED  {compressed_file}: {e}")
+    messagebox.showinfo("Verification Results", "\n".join(lines))
 
-def select_files():
+def select_files_to_verify():
+    """
+    Open a file dialog to select multiple compressed files for verification.
+    """
+    file_paths = filedialog.askopenfilenames(title="Select Compressed Files to Verify",
+                                             filetypes=[("LZW Compressed Files", "*.lzw *.lza"),
+                                                        ("All Files", "*.*")])
+    if file_paths:
+        verify_files(file_paths)
+
+def select_files(entry_memory_budget, entry_workers, progress_panel, select_button):
     """
     Open a file dialog to select multiple compressed files for decompression.
+
+    Parameters:
+        entry_memory_budget (tk.Entry): Entry widget for the memory budget in MB.
+        entry_workers (tk.Entry): Entry widget for the number of worker processes.
+        progress_panel (ProgressPanel): Shows progress and offers cancellation.
+        select_button (tk.Button): Disabled while decompression runs.
     """
+    try:
+        memory_budget = int(float(entry_memory_budget.get()) * 1024 * 1024) if entry_memory_budget.get() else None
+        workers = int(entry_workers.get()) if entry_workers.get() else None
+    except ValueError:
+        messagebox.showerror("Invalid Input", "Please enter valid numbers for the parameters.")
+        return
+
+    if workers is not None and workers < 1:
+        messagebox.showerror("Invalid Worker Count", "Worker processes must be at least 1.")
+        return
+
     file_paths = filedialog.askopenfilenames(title="Select Compressed Files to Decompress",
-                                             filetypes=[("LZW Compressed Files", "*.lzw"), ("All Files", "*.*")])
+                                             filetypes=[("LZW Compressed Files", "*.lzw *.lza"), ("All Files", "*.*")])
     if file_paths:
-        decompress_files(file_paths)
+        # Decompress on a worker thread so the window stays responsive
+        job = BackgroundJob(batch_decompress, file_paths, workers, memory_budget)
+        job.kwargs.update(progress=job.report_progress, cancel_event=job.cancel_event)
+
+        def done(reports, error):
+            if error is not None:
+                messagebox.showerror("Decompression Error", f"An error occurred while decompressing: {error}")
+            else:
+                show_decompression_summary(reports)
+
+        progress_panel.run(job, done, busy_widgets=[select_button])
 
 def create_ui():
     """
@@ -136,7 +464,7 @@ def create_ui():
 
     # Set window size and position
     window_width = 400
-    window_height = 200
+    window_height = 420
     screen_width = root.winfo_screenwidth()
     screen_height = root.winfo_screenheight()
     x_position = (screen_width // 2) - (window_width // 2)
@@ -150,10 +478,34 @@ def create_ui():
     label = tk.Label(root, text="LZW Decompression Tool", font=("Arial", 16))
     label.pack(pady=20)
 
+    # Memory Budget
+    frame_params = tk.Frame(root)
+    frame_params.pack()
+    label_memory_budget = tk.Label(frame_params, text="Memory Budget in MB (Optional):")
+    label_memory_budget.grid(row=0, column=0, sticky='e', padx=5, pady=5)
+    entry_memory_budget = tk.Entry(frame_params)
+    entry_memory_budget.grid(row=0, column=1, padx=5, pady=5)
+
+    # Worker Processes
+    label_workers = tk.Label(frame_params, text="Worker Processes (Optional):")
+    label_workers.grid(row=1, column=0, sticky='e', padx=5, pady=5)
+    entry_workers = tk.Entry(frame_params)
+    entry_workers.grid(row=1, column=1, padx=5, pady=5)
+
     # Create a button to select files
     select_button = tk.Button(root, text="Select Files to Decompress",
-                              command=select_files)
-    select_button.pack(pady=20)
+                              command=lambda: select_files(entry_memory_budget, entry_workers,
+                                                          progress_panel, select_button))
+    select_button.pack(pady=10)
+
+    # Create a button to verify files without decompressing them
+    verify_button = tk.Button(root, text="Verify Files",
+                              command=select_files_to_verify)
+    verify_button.pack(pady=10)
+
+    # Progress, throughput and cancellation of the running job
+    progress_panel = ProgressPanel(root)
+    progress_panel.pack(pady=5)
 
     # Start the main event loop
     root.mainloop()
@@ -0,0 +1,352 @@
+import hashlib
+import random
+import zlib
+from collections import deque
+
+# Content-defined chunking: a cut is made where the gear hash of the last
+# 32 bytes has its top AVERAGE_CHUNK_BITS bits clear, which gives chunks
+# of about 2^AVERAGE_CHUNK_BITS bytes that resynchronise after an edit.
+MIN_CHUNK_SIZE = 2 * 1024
+AVERAGE_CHUNK_BITS = 13
+MAX_CHUNK_SIZE = 64 * 1024
+_CUT_MASK = ((1 << AVERAGE_CHUNK_BITS) - 1) << (32 - AVERAGE_CHUNK_BITS)
+
+# Chunks shorter than this are always stored as literals.
+MIN_DEDUP_LENGTH = 64
+
+# References only reach back this many bytes of the stream, which bounds the
+# index of the writer and the checksums kept by the verifier. The window is
+# recorded in the stream header as log2; 0 there means no limit.
+DEFAULT_DEDUP_WINDOW_BITS = 27
+MIN_DEDUP_WINDOW_BITS = 20
+
+# Measured footprint of one index entry (digest, offset and length, plus the
+# eviction queue) and of one verifier entry, with room for dict resizes.
+_INDEX_ENTRY_BYTES = 352
+_VERIFY_ENTRY_BYTES = 256
+
+# Fixed random table of the gear hash; changing it changes the chunking.
+_gear_rng = random.Random(0x4C5A57)
+_GEAR = [_gear_rng.getrandbits(32) for _ in range(256)]
+del _gear_rng
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated dedup recipe")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def chunk_boundaries(data):
+    """
+    Split `data` into content-defined chunks.
+
+    Returns:
+        List[int]: The end offset of every chunk; the last one is len(data).
+    """
+    gear = _GEAR
+    mask = _CUT_MASK
+    n = len(data)
+    cuts = []
+    start = 0
+    while start < n:
+        end = min(start + MAX_CHUNK_SIZE, n)
+        cut = end
+        h = 0
+        for i in range(min(start + MIN_CHUNK_SIZE, end), end):
+            h = ((h << 1) + gear[data[i]]) & 0xFFFFFFFF
+            if not h & mask:
+                cut = i + 1
+                break
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def _gf2_times(matrix, vector):
+    total = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return total
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def crc32_combine(crc1, crc2, length2):
+    """
+    Return the CRC32 of A + B from the CRC32 of A, the CRC32 of B and the
+    length of B, as zlib's crc32_combine does.
+    """
+    if length2 <= 0:
+        return crc1
+    # Operator for one zero bit, then two and four zero bits
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    # Apply length2 zero bytes to crc1, one bit of length2 at a time
+    while True:
+        even = _gf2_square(odd)
+        if length2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+        odd = _gf2_square(even)
+        if length2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+    return crc1 ^ crc2
+
+
+def window_entries(window, block_size):
+    """
+    Return the most chunks that can start within `window` bytes when blocks
+    are `block_size` bytes: full chunks plus one short chunk per block.
+    """
+    return window // MIN_CHUNK_SIZE + window // block_size + 1
+
+
+class DedupIndex:
+    """
+    Find chunks of a stream that repeat earlier ones.
+
+    Every new chunk is recorded under a 128-bit BLAKE2b digest with its
+    offset in the original stream. A later chunk with the same digest and
+    length becomes a reference to that offset; only the other chunks are
+    left for LZW. Chunks that start more than 2^window_bits bytes back are
+    evicted, so the index holds at most one entry per chunk of the window.
+
+    References stay within one stream: every `.lzw` file and every archive
+    member starts with an empty index, so each can be decoded on its own.
+    Appends to a checkpointed stream continue its saved index.
+
+    Parameters:
+        window_bits (int): log2 of the window references may reach back;
+                           0 for no limit.
+    """
+
+    def __init__(self, window_bits=DEFAULT_DEDUP_WINDOW_BITS):
+        self.window = 1 << window_bits if window_bits else None
+        self.chunks = {}  # digest -> (offset, length)
+        self.order = deque()  # (offset, digest) in stream order, for eviction
+
+    @staticmethod
+    def estimate_nbytes(window_bits, block_size):
+        """
+        Return the memory the index uses at most for blocks of `block_size` bytes.
+        """
+        return window_entries(1 << window_bits, block_size) * _INDEX_ENTRY_BYTES
+
+    def entries(self):
+        """
+        Return the indexed chunks as (offset, length, digest), in stream order.
+        """
+        return sorted((offset, length, digest) for digest, (offset, length) in self.chunks.items())
+
+    def load(self, entries):
+        """
+        Index chunks returned by `entries`, e.g. restored from a checkpoint.
+        """
+        for offset, length, digest in entries:
+            self.chunks[digest] = (offset, length)
+            if self.window is not None:
+                self.order.append((offset, digest))
+
+    def _evict(self, position):
+        order = self.order
+        chunks = self.chunks
+        oldest = position - self.window
+        while order and order[0][0] < oldest:
+            offset, digest = order.popleft()
+            known = chunks.get(digest)
+            if known is not None and known[0] == offset:
+                del chunks[digest]
+
+    def split(self, data, offset):
+        """
+        Split one block into a recipe and the literal bytes it still needs.
+
+        Recipe layout: number of entries, then per entry
+        (length << 1 | is_reference) and, for references, the offset of the
+        earlier chunk in the original stream.
+
+        Parameters:
+            data (bytes): The original bytes of the block.
+            offset (int): Offset of the block in the original stream.
+
+        Returns:
+            Tuple[bytes, bytes]: The recipe and the literal bytes.
+        """
+        view = memoryview(data)
+        entries = bytearray()
+        literals = bytearray()
+        count = 0
+        start = 0
+        for end in chunk_boundaries(data):
+            chunk = view[start:end]
+            length = end - start
+            count += 1
+            if length >= MIN_DEDUP_LENGTH:
+                if self.window is not None:
+                    self._evict(offset + start)
+                digest = hashlib.blake2b(chunk, digest_size=16).digest()
+                known = self.chunks.get(digest)
+                if known is not None and known[1] == length:
+                    _write_varint(entries, length << 1 | 1)
+                    _write_varint(entries, known[0])
+                    start = end
+                    continue
+                self.chunks[digest] = (offset + start, length)
+                if self.window is not None:
+                    self.order.append((offset + start, digest))
+            _write_varint(entries, length << 1)
+            literals += chunk
+            start = end
+        recipe = bytearray()
+        _write_varint(recipe, count)
+        recipe += entries
+        return bytes(recipe), bytes(literals)
+
+
+def parse_recipe(payload):
+    """
+    Read the recipe at the start of a block payload.
+
+    Returns:
+        Tuple[List[Tuple[bool, int, int]], int]: The entries as
+        (is_reference, length, reference offset) and the offset of the
+        LZW payload that follows.
+    """
+    count, pos = _read_varint(payload, 0)
+    entries = []
+    for _ in range(count):
+        value, pos = _read_varint(payload, pos)
+        if value & 1:
+            offset, pos = _read_varint(payload, pos)
+            entries.append((True, value >> 1, offset))
+        else:
+            entries.append((False, value >> 1, 0))
+    return entries, pos
+
+
+class DedupRestorer:
+    """
+    Rebuild blocks from their recipes and literal bytes.
+
+    References are read back from the output written so far (`history`, a
+    readable and seekable file positioned where the stream's output
+    starts), or from the current block. In verify mode nothing is read
+    back: the CRC32 of every literal chunk that could be referenced is
+    kept for as long as it is within the window, and references are
+    accounted for with `crc32_combine`.
+
+    Parameters:
+        history (file, optional): The output being written.
+        verify_only (bool): Check checksums without the referenced data.
+        window_bits (int): log2 of the window references may reach back,
+                           from the stream header; 0 for no limit.
+    """
+
+    def __init__(self, history=None, verify_only=False, window_bits=0):
+        self.history = history
+        self.history_base = history.tell() if history is not None else 0
+        self.window = 1 << window_bits if window_bits else None
+        self.chunk_crcs = {} if verify_only else None  # offset -> (length, crc32), in stream order
+
+    @staticmethod
+    def estimate_nbytes(window_bits, block_size):
+        """
+        Return the memory the verify-mode checksums use at most.
+        """
+        return window_entries(1 << window_bits, block_size) * _VERIFY_ENTRY_BYTES
+
+    def _evict(self, position):
+        chunk_crcs = self.chunk_crcs
+        oldest = position - self.window
+        while chunk_crcs:
+            offset = next(iter(chunk_crcs))
+            if offset >= oldest:
+                break
+            del chunk_crcs[offset]
+
+    def read_back(self, offset, length):
+        history = self.history
+        position = history.tell()
+        history.seek(self.history_base + offset)
+        data = history.read(length)
+        history.seek(position)
+        return data
+
+    def restore(self, entries, literals, block_offset, sink):
+        """
+        Rebuild one block.
+
+        In verify mode the pieces go to `sink` directly and references are
+        passed to `sink.skip(length, crc)`; otherwise the block is returned.
+
+        Returns:
+            bytes: The block's original bytes, or b'' in verify mode.
+        """
+        out = bytearray()
+        position = block_offset
+        literal_pos = 0
+        for is_reference, length, offset in entries:
+            if self.window is not None and self.chunk_crcs is not None:
+                self._evict(position)
+            if not is_reference:
+                piece = literals[literal_pos:literal_pos + length]
+                if len(piece) != length:
+                    raise ValueError("Dedup recipe needs more literal bytes than the block has")
+                literal_pos += length
+                if self.chunk_crcs is not None:
+                    if length >= MIN_DEDUP_LENGTH:
+                        self.chunk_crcs[position] = (length, zlib.crc32(piece))
+                    sink(piece)
+                else:
+                    out += piece
+            elif offset + length > position:
+                raise ValueError(f"Dedup reference to offset {offset} is not behind the output")
+            elif self.window is not None and offset < position - self.window:
+                raise ValueError(f"Dedup reference to offset {offset} is outside the window")
+            elif self.chunk_crcs is not None:
+                known = self.chunk_crcs.get(offset)
+                if known is None or known[0] != length:
+                    raise ValueError(f"Dedup reference to offset {offset} does not match a chunk")
+                sink.skip(length, known[1])
+            elif offset >= block_offset:
+                start = offset - block_offset
+                out += out[start:start + length]
+            elif self.history is not None:
+                piece = self.read_back(offset, length)
+                if len(piece) != length:
+                    raise ValueError(f"Dedup reference to offset {offset} is past the output")
+                out += piece
+            else:
+                raise ValueError("Dedup references need the output to be readable and seekable")
+            position += length
+        if literal_pos != len(literals):
+            raise ValueError("Dedup block has unused literal bytes")
+        return bytes(out)
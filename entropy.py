@@ -0,0 +1,279 @@
+import heapq
+from array import array
+from collections import Counter
+from lzw_codec import BitWriter, BitReader
+
+# Payload modes, stored in the first byte of an entropy-coded block payload.
+MODE_FIXED = 0
+MODE_HUFFMAN = 1
+
+# Longest Huffman code. Codes are at most 24 bits wide, so every block's
+# alphabet fits within this length.
+MAX_CODE_LENGTH = 24
+
+# Width of the decoder's direct lookup table; longer codes are resolved
+# with the canonical first-code/count tables.
+TABLE_BITS = 11
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated Huffman table")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def code_lengths(frequencies, max_length=MAX_CODE_LENGTH):
+    """
+    Compute Huffman code lengths, limited to `max_length` bits.
+
+    When the optimal tree is too deep, the frequencies are halved (keeping
+    them at least 1) and the tree is rebuilt, which flattens it.
+
+    Parameters:
+        frequencies (dict): Symbol -> number of occurrences.
+        max_length (int): Longest allowed code.
+
+    Returns:
+        dict: Symbol -> code length in bits.
+    """
+    symbols = sorted(frequencies)
+    if len(symbols) == 1:
+        return {symbols[0]: 1}
+    weights = [frequencies[symbol] for symbol in symbols]
+    while True:
+        n = len(symbols)
+        heap = [(weight, i) for i, weight in enumerate(weights)]
+        heapq.heapify(heap)
+        parent = [0] * (2 * n - 1)
+        next_node = n
+        while len(heap) > 1:
+            weight_a, a = heapq.heappop(heap)
+            weight_b, b = heapq.heappop(heap)
+            parent[a] = parent[b] = next_node
+            heapq.heappush(heap, (weight_a + weight_b, next_node))
+            next_node += 1
+        # Parents always have higher indices than their children
+        depth = [0] * (2 * n - 1)
+        for node in range(2 * n - 3, -1, -1):
+            depth[node] = depth[parent[node]] + 1
+        if max(depth[:n]) <= max_length:
+            return dict(zip(symbols, depth[:n]))
+        weights = [max(1, weight >> 1) for weight in weights]
+
+
+def canonical_codes(lengths):
+    """
+    Assign canonical Huffman codes: shorter codes first, ties by symbol.
+
+    Parameters:
+        lengths (dict): Symbol -> code length in bits.
+
+    Returns:
+        List[Tuple[int, int, int]]: (symbol, length, code) in canonical order.
+    """
+    ordered = sorted(lengths.items(), key=lambda item: (item[1], item[0]))
+    result = []
+    code = 0
+    previous_length = ordered[0][1]
+    for symbol, length in ordered:
+        code <<= length - previous_length
+        previous_length = length
+        result.append((symbol, length, code))
+        code += 1
+    return result
+
+
+def huffman_encode(codes):
+    """
+    Encode LZW codes with a canonical Huffman code built for them.
+
+    Layout: number of codes, number of distinct codes, then for each distinct
+    code in ascending order its gap from the previous one and its length
+    (the sparse length table), followed by the bit stream, most
+    significant bit first, padded to a whole byte.
+
+    Parameters:
+        codes (Sequence[int]): The LZW codes of one block.
+
+    Returns:
+        bytes: The encoded codes.
+    """
+    out = bytearray()
+    _write_varint(out, len(codes))
+    if not codes:
+        return bytes(out)
+    lengths = code_lengths(Counter(codes))
+    _write_varint(out, len(lengths))
+    previous = -1
+    for symbol in sorted(lengths):
+        _write_varint(out, symbol - previous - 1)
+        out.append(lengths[symbol])
+        previous = symbol
+
+    table = {symbol: (code, length) for symbol, length, code in canonical_codes(lengths)}
+    buffer = 0
+    bits_in_buffer = 0
+    for symbol in codes:
+        code, length = table[symbol]
+        buffer = (buffer << length) | code
+        bits_in_buffer += length
+        if bits_in_buffer >= 32:
+            bits_in_buffer -= 32
+            out += (buffer >> bits_in_buffer).to_bytes(4, 'big')
+            buffer &= (1 << bits_in_buffer) - 1
+    while bits_in_buffer >= 8:
+        bits_in_buffer -= 8
+        out.append((buffer >> bits_in_buffer) & 0xFF)
+    if bits_in_buffer:
+        out.append((buffer << (8 - bits_in_buffer)) & 0xFF)
+    return bytes(out)
+
+
+def huffman_decode(data):
+    """
+    Decode the output of `huffman_encode`.
+
+    Parameters:
+        data (bytes): The encoded codes.
+
+    Returns:
+        array: The LZW codes.
+
+    Raises:
+        ValueError: If the data is malformed.
+    """
+    count, pos = _read_varint(data, 0)
+    codes = array('i')
+    if count == 0:
+        return codes
+    n, pos = _read_varint(data, pos)
+    if n == 0:
+        raise ValueError("Empty Huffman table")
+    lengths = {}
+    symbol = -1
+    for _ in range(n):
+        gap, pos = _read_varint(data, pos)
+        if pos >= len(data):
+            raise ValueError("Truncated Huffman table")
+        symbol += gap + 1
+        length = data[pos]
+        pos += 1
+        if not 1 <= length <= MAX_CODE_LENGTH:
+            raise ValueError(f"Invalid Huffman code length {length}")
+        lengths[symbol] = length
+
+    canonical = canonical_codes(lengths)
+    max_length = canonical[-1][1]
+    if canonical[-1][2] >= 1 << max_length:
+        raise ValueError("Huffman code lengths are oversubscribed")
+
+    # Direct table for codes up to `table_bits` long
+    table_bits = min(max_length, TABLE_BITS)
+    table_symbols = [0] * (1 << table_bits)
+    table_lengths = [0] * (1 << table_bits)
+    # Canonical tables for longer codes: first code, count and offset per length
+    first = [0] * (max_length + 1)
+    counts = [0] * (max_length + 1)
+    offsets = [0] * (max_length + 1)
+    long_symbols = []
+    for symbol, length, code in canonical:
+        if length <= table_bits:
+            start = code << (table_bits - length)
+            end = (code + 1) << (table_bits - length)
+            table_symbols[start:end] = [symbol] * (end - start)
+            table_lengths[start:end] = [length] * (end - start)
+        else:
+            if counts[length] == 0:
+                first[length] = code
+                offsets[length] = len(long_symbols)
+            counts[length] += 1
+            long_symbols.append(symbol)
+
+    table_shift = max_length - table_bits
+    window_mask = (1 << max_length) - 1
+    # Zero padding lets the last codes be peeked at full width
+    data_len = len(data) - pos
+    data = bytes(data[pos:]) + bytes(8)
+    byte_pos = 0
+    buffer = 0
+    bits_in_buffer = 0
+    append = codes.append
+    for _ in range(count):
+        while bits_in_buffer < max_length:
+            if byte_pos > data_len + 4:
+                raise ValueError("Truncated Huffman bit stream")
+            buffer = (buffer << 32) | int.from_bytes(data[byte_pos:byte_pos + 4], 'big')
+            byte_pos += 4
+            bits_in_buffer += 32
+        window = (buffer >> (bits_in_buffer - max_length)) & window_mask
+        length = table_lengths[window >> table_shift]
+        if length:
+            append(table_symbols[window >> table_shift])
+        else:
+            for length in range(table_bits + 1, max_length + 1):
+                index = (window >> (max_length - length)) - first[length]
+                if 0 <= index < counts[length]:
+                    append(long_symbols[offsets[length] + index])
+                    break
+            else:
+                raise ValueError("Invalid Huffman code")
+        bits_in_buffer -= length
+        buffer &= (1 << bits_in_buffer) - 1
+    if byte_pos * 8 - bits_in_buffer > data_len * 8:
+        raise ValueError("Truncated Huffman bit stream")
+    return codes
+
+
+def encode_block(codes, code_bit_length):
+    """
+    Encode the LZW codes of one block, falling back to fixed-width codes
+    when Huffman coding would not make the block smaller.
+
+    Parameters:
+        codes (Sequence[int]): The LZW codes of one block.
+        code_bit_length (int): Number of bits used to represent each code.
+
+    Returns:
+        bytes: A mode byte followed by the encoded codes.
+    """
+    writer = BitWriter(code_bit_length)
+    fixed = writer.pack(codes) + writer.flush()
+    encoded = huffman_encode(codes)
+    if len(encoded) < len(fixed):
+        return bytes([MODE_HUFFMAN]) + encoded
+    return bytes([MODE_FIXED]) + fixed
+
+
+def decode_block(payload, code_bit_length):
+    """
+    Decode the output of `encode_block`.
+
+    Returns:
+        array: The LZW codes.
+
+    Raises:
+        ValueError: If the payload is malformed.
+    """
+    if not payload:
+        raise ValueError("Empty entropy-coded payload")
+    mode = payload[0]
+    if mode == MODE_HUFFMAN:
+        return huffman_decode(memoryview(payload)[1:])
+    if mode == MODE_FIXED:
+        return BitReader(code_bit_length).unpack(payload[1:])
+    raise ValueError(f"Unknown entropy coding mode {mode}")
@@ -1,15 +1,99 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use('Agg')  # Etkileşimsiz arka uç; pyplot'un global durumu kullanılmaz
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from results_store import DEFAULT_RESULTS_DB, ResultsStore
+
+# Grafiklerin girdilerinin özetlerini tutan dosya (değişmeyen grafikler atlanır)
+MANIFEST_FILE_NAME = '.chart_manifest.json'
+
+
+def load_results():
+    """
+    Sonuçları yükler: önce sonuç veritabanından, yoksa birleştirilmiş Excel dosyasından.
+
+    Returns:
+        pd.DataFrame: Sonuç satırları, ya da bulunamazsa None.
+    """
+    if os.path.exists(DEFAULT_RESULTS_DB):
+        with ResultsStore() as store:
+            rows = store.latest_results()
+        if rows:
+            return pd.DataFrame(rows)
 
-def create_charts():
-    # Excel dosyasını okuma
     excel_file = 'Aggregated_Compression_Results.xlsx'
     if not os.path.exists(excel_file):
         print(f"Excel dosyası '{excel_file}' bulunamadı.")
-        return
+        return None
+    return pd.read_excel(excel_file)
+
+
+def chart_digest(task):
+    """
+    Grafiğin girdilerinin özetini döndürür; girdiler değişmediyse özet de değişmez.
+    """
+    payload = json.dumps([task['title'], task['x'], task['y']], default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def render_chart(task):
+    """
+    Tek bir grafiği nesne yönelimli API ile çizer ve kaydeder.
+    İşçi süreçlerde çalışır.
+
+    Returns:
+        str: Kaydedilen grafiğin yolu.
+    """
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(task['x'], task['y'], marker='o')
 
-    df = pd.read_excel(excel_file)
+    # Başlık ve etiketler
+    ax.set_title(task['title'])
+    ax.set_xlabel('Max Dictionary Size')
+    ax.set_ylabel('Compression Performance (%)')
+    ax.grid(True)
+
+    # Grafiği kaydetme
+    fig.savefig(task['path'])
+    return task['path']
+
+
+def build_tasks(df, output_dir):
+    """
+    Her (dosya adı, Code Bit Length) grubu için bir çizim görevi oluşturur.
+    Veri çerçevesi yalnızca bir kez gruplanır.
+    """
+    tasks = []
+    df_sorted = df.sort_values('Max Dictionary Size')
+    for (file_name, code_bit_length), df_cbl in df_sorted.groupby(['File Name', 'Code Bit Length'], sort=False):
+        sanitized_file_name = str(file_name).replace(' ', '_').replace('.', '_')
+        chart_filename = f"{sanitized_file_name}_CodeBitLength_{code_bit_length}.png"
+        tasks.append({
+            'title': f"{file_name} - Code Bit Length: {code_bit_length}",
+            'x': df_cbl['Max Dictionary Size'].tolist(),
+            'y': df_cbl['Compression Performance (%)'].tolist(),
+            'path': os.path.join(output_dir, chart_filename),
+        })
+    return tasks
+
+
+def create_charts(workers=None):
+    """
+    Her dosya ve Code Bit Length için sıkıştırma performansı grafiklerini oluşturur.
+
+    Parameters:
+        workers (int, optional): İşçi süreç sayısı; varsayılan CPU sayısıdır.
+    """
+    df = load_results()
+    if df is None:
+        return
 
     # 'Max Dictionary Size' sütunundaki 'No Limit' değerlerini uygun şekilde işleme
     df['Max Dictionary Size'] = df['Max Dictionary Size'].replace('No Limit', float('inf'))
@@ -19,35 +103,33 @@ def create_charts():
     output_dir = 'Charts'
     os.makedirs(output_dir, exist_ok=True)
 
-    # Tüm benzersiz dosya adları için döngü
-    for file_name in df['File Name'].unique():
-        df_file = df[df['File Name'] == file_name]
-
-        # Tüm benzersiz Code Bit Length değerleri için döngü
-        for code_bit_length in df_file['Code Bit Length'].unique():
-            df_cbl = df_file[df_file['Code Bit Length'] == code_bit_length]
-
-            # Max Dictionary Size'a göre sıralama
-            df_cbl_sorted = df_cbl.sort_values('Max Dictionary Size')
+    # Önceki çalıştırmanın özetlerini okuma
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
 
-            # Grafik oluşturma
-            plt.figure(figsize=(10, 6))
-            plt.plot(df_cbl_sorted['Max Dictionary Size'], df_cbl_sorted['Compression Performance (%)'], marker='o')
+    # Girdileri değişmeyen grafikleri atlama
+    tasks = build_tasks(df, output_dir)
+    pending = []
+    for task in tasks:
+        digest = chart_digest(task)
+        if manifest.get(task['path']) == digest and os.path.exists(task['path']):
+            continue
+        task['digest'] = digest
+        pending.append(task)
 
-            # Başlık ve etiketler
-            plt.title(f"{file_name} - Code Bit Length: {code_bit_length}")
-            plt.xlabel('Max Dictionary Size')
-            plt.ylabel('Compression Performance (%)')
-            plt.grid(True)
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for task, chart_filepath in zip(pending, executor.map(render_chart, pending, chunksize=8)):
+                manifest[task['path']] = task['digest']
+                print(f"Grafik oluşturuldu ve kaydedildi: {chart_filepath}")
 
-            # Grafiği kaydetme
-            sanitized_file_name = file_name.replace(' ', '_').replace('.', '_')
-            chart_filename = f"{sanitized_file_name}_CodeBitLength_{code_bit_length}.png"
-            chart_filepath = os.path.join(output_dir, chart_filename)
-            plt.savefig(chart_filepath)
-            plt.close()
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
 
-            print(f"Grafik oluşturuldu ve kaydedildi: {chart_filepath}")
+    print(f"{len(pending)} grafik oluşturuldu, değişmeyen {len(tasks) - len(pending)} grafik atlandı.")
 
 if __name__ == "__main__":
-    create_charts()
\ No newline at end of file
+    create_charts()
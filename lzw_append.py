@@ -0,0 +1,265 @@
+import argparse
+import os
+import struct
+import sys
+import zlib
+from array import array
+from compact_dictionary import CompactDictionary
+from lzw_codec import LZWEncoder
+from lzw_format import (BLOCK_HEADER, DEFAULT_BLOCK_SIZE, FLAG_DEDUP, BlockWriter, CorruptFileError,
+                        OperationCancelled, read_header)
+
+# Appendable outputs keep their encoder state in `<output>.ckpt`.
+CHECKPOINT_SUFFIX = '.ckpt'
+CHECKPOINT_MAGIC = b'LZWK'
+CHECKPOINT_VERSION = 2
+
+# magic, version, flags, code bit length, reserved, max dictionary size (0 = no limit),
+# offset of the end marker, original bytes so far, their CRC32, dictionary entries
+CHECKPOINT_HEADER = struct.Struct('>4sBBBxIQQII')
+
+# Version 2 checkpoints of FLAG_DEDUP streams follow the dictionary with the
+# number of indexed dedup chunks and, in stream order, each chunk's
+# original offset, length and digest.
+DEDUP_COUNT = struct.Struct('>I')
+DEDUP_ENTRY = struct.Struct('>QI16s')
+
+# The dictionary buffers are stored little-endian.
+_SWAP = sys.byteorder != 'little'
+
+
+class CheckpointError(ValueError):
+    """
+    Raised when a checkpoint is missing, corrupt or does not match its output.
+    """
+
+
+def checkpoint_path(output_path):
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def save_checkpoint(path, writer, end_offset):
+    """
+    Write the encoder state of a closed BlockWriter atomically.
+
+    Every block ends at a flush point, so the pending sequence and the bit
+    buffer are empty and only the dictionary needs to be saved: its prefix
+    and suffix buffers, not the hash table, which is rebuilt on load. For
+    FLAG_DEDUP streams the dedup index, bounded by its window, is saved
+    too, so appended data can refer back to data written before.
+
+    Parameters:
+        path (str): The checkpoint file.
+        writer (BlockWriter): The writer, after `close`.
+        end_offset (int): Offset of the end-of-stream marker in the output.
+    """
+    prefix, suffix = writer.encoder.entries()
+    size = len(prefix)
+    if _SWAP:
+        prefix.byteswap()
+    body = bytearray(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, writer.flags,
+                                            writer.code_bit_length, writer.max_dict_size or 0,
+                                            end_offset, writer.raw_size, writer.crc, size))
+    body += prefix.tobytes()
+    body += suffix.tobytes()
+    if writer.dedup is not None:
+        entries = writer.dedup.entries()
+        body += DEDUP_COUNT.pack(len(entries))
+        for entry in entries:
+            body += DEDUP_ENTRY.pack(*entry)
+    body += struct.pack('>I', zlib.crc32(body))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint written by `save_checkpoint`.
+
+    Returns:
+        Tuple[dict, CompactDictionary]: The stream parameters and position
+        ('flags', 'code_bit_length', 'max_dict_size', 'end_offset',
+        'raw_size', 'crc', and 'dedup_entries', the saved dedup index,
+        empty for checkpoints written before it was saved), and the encoder
+        dictionary.
+    """
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        raise CheckpointError(f"No checkpoint found at '{path}'") from None
+    if len(body) < CHECKPOINT_HEADER.size + 4 or body[:4] != CHECKPOINT_MAGIC:
+        raise CheckpointError(f"'{path}' is not an LZW checkpoint")
+    if struct.unpack('>I', body[-4:])[0] != zlib.crc32(body[:-4]):
+        raise CheckpointError(f"Checkpoint '{path}' is corrupt")
+    (_, version, flags, code_bit_length, max_dict_size,
+     end_offset, raw_size, crc, size) = CHECKPOINT_HEADER.unpack_from(body)
+    if version not in (1, CHECKPOINT_VERSION):
+        raise CheckpointError(f"Unsupported checkpoint version {version}")
+    prefix_start = CHECKPOINT_HEADER.size
+    suffix_start = prefix_start + size * array('i').itemsize
+    prefix = array('i')
+    prefix.frombytes(body[prefix_start:suffix_start])
+    if _SWAP:
+        prefix.byteswap()
+    suffix = array('B', body[suffix_start:suffix_start + size])
+    dedup_entries = []
+    pos = suffix_start + size
+    if version >= 2 and flags & FLAG_DEDUP:
+        if pos + DEDUP_COUNT.size > len(body) - 4:
+            raise CheckpointError(f"Checkpoint '{path}' is corrupt")
+        count, = DEDUP_COUNT.unpack_from(body, pos)
+        pos += DEDUP_COUNT.size
+        if pos + count * DEDUP_ENTRY.size > len(body) - 4:
+            raise CheckpointError(f"Checkpoint '{path}' is corrupt")
+        dedup_entries = [DEDUP_ENTRY.unpack_from(body, pos + i * DEDUP_ENTRY.size) for i in range(count)]
+    dictionary = CompactDictionary.from_entries(prefix, suffix, max_dict_size or None)
+    state = {
+        'flags': flags,
+        'code_bit_length': code_bit_length,
+        'max_dict_size': max_dict_size or None,
+        'end_offset': end_offset,
+        'raw_size': raw_size,
+        'crc': crc,
+        'dedup_entries': dedup_entries,
+    }
+    return state, dictionary
+
+
+def _copy(src, writer, block_size, progress, cancel_event):
+    appended = 0
+    while True:
+        chunk = src.read(block_size)
+        if not chunk:
+            return appended
+        writer.write(chunk)
+        appended += len(chunk)
+        if progress is not None:
+            progress(appended)
+        if cancel_event is not None and cancel_event.is_set():
+            raise OperationCancelled("Append cancelled")
+
+
+def compress_stream_appendable(src, output_path, code_bit_length, max_dict_size=None,
+                               block_size=DEFAULT_BLOCK_SIZE, flags=0, progress=None, cancel_event=None):
+    """
+    Compress `src` into a new block-format `.lzw` file and save a checkpoint
+    next to it, so that later data can be appended.
+
+    Returns:
+        int: Number of original bytes compressed.
+    """
+    try:
+        with open(output_path, 'wb') as dst:
+            writer = BlockWriter(dst, code_bit_length, max_dict_size, block_size, flags)
+            _copy(src, writer, block_size, progress, cancel_event)
+            writer.close()
+            end_offset = dst.tell() - BLOCK_HEADER.size
+        save_checkpoint(checkpoint_path(output_path), writer, end_offset)
+    except Exception:
+        _remove_partial(output_path)
+        _remove_partial(checkpoint_path(output_path))
+        raise
+    return writer.raw_size
+
+
+def append_stream(src, output_path, block_size=DEFAULT_BLOCK_SIZE, progress=None, cancel_event=None):
+    """
+    Append everything readable from `src` to an appendable `.lzw` file.
+
+    The end marker is overwritten by new blocks that continue the saved
+    dictionary, then a new end marker and checkpoint are written. Only the
+    new data is read and encoded. If the append fails or is cancelled, the
+    output is restored to its previous end.
+
+    Parameters:
+        src (file): Binary file object with the new data.
+        output_path (str): The `.lzw` file to extend.
+        block_size (int): Number of original bytes per block.
+        progress (callable, optional): Called with the number of new bytes
+                                       compressed after each block.
+        cancel_event (threading.Event, optional): Checked after each block.
+
+    Returns:
+        int: Number of original bytes appended.
+    """
+    state, dictionary = load_checkpoint(checkpoint_path(output_path))
+    end_offset = state['end_offset']
+    with open(output_path, 'r+b') as f:
+        header = read_header(f)
+        if (header.flags, header.code_bit_length, header.max_dict_size) != \
+                (state['flags'], state['code_bit_length'], state['max_dict_size']):
+            raise CheckpointError(f"Checkpoint does not match the header of '{output_path}'")
+        f.seek(0, os.SEEK_END)
+        if f.tell() != end_offset + BLOCK_HEADER.size:
+            raise CheckpointError(f"'{output_path}' has changed since its checkpoint was written")
+        f.seek(end_offset)
+        if f.read(BLOCK_HEADER.size) != BLOCK_HEADER.pack(0, 0, 0):
+            raise CorruptFileError(f"'{output_path}' does not end with an end-of-stream marker")
+
+        f.seek(end_offset)
+        encoder = LZWEncoder(state['max_dict_size'], dictionary)
+        writer = BlockWriter(f, state['code_bit_length'], state['max_dict_size'], block_size,
+                             state['flags'], encoder=encoder, dedup_window_bits=header.dedup_window_bits)
+        writer.raw_size = state['raw_size']
+        writer.crc = state['crc']
+        if writer.dedup is not None:
+            writer.dedup.load(state['dedup_entries'])
+        try:
+            appended = _copy(src, writer, block_size, progress, cancel_event)
+            writer.close()
+            f.truncate()
+            new_end_offset = f.tell() - BLOCK_HEADER.size
+        except BaseException:
+            f.seek(end_offset)
+            f.truncate()
+            f.write(BLOCK_HEADER.pack(0, 0, 0))
+            raise
+    save_checkpoint(checkpoint_path(output_path), writer, new_end_offset)
+    return appended
+
+
+def update_file(input_path, output_path, code_bit_length=12, max_dict_size=None,
+                block_size=DEFAULT_BLOCK_SIZE, flags=0, progress=None, cancel_event=None):
+    """
+    Bring the compressed copy of a growing file up to date.
+
+    On the first call the whole input is compressed with the given
+    settings. Later calls only read the bytes added to the input since the
+    checkpoint and append them; the settings stored in the checkpoint are
+    used.
+
+    Returns:
+        int: Number of original bytes compressed by this call.
+    """
+    with open(input_path, 'rb') as src:
+        if not os.path.exists(checkpoint_path(output_path)):
+            return compress_stream_appendable(src, output_path, code_bit_length, max_dict_size,
+                                              block_size, flags, progress, cancel_event)
+        state, _ = load_checkpoint(checkpoint_path(output_path))
+        if os.fstat(src.fileno()).st_size < state['raw_size']:
+            raise CheckpointError(f"'{input_path}' is shorter than the data already compressed; "
+                                  f"it was truncated or replaced")
+        src.seek(state['raw_size'])
+        return append_stream(src, output_path, block_size, progress, cancel_event)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress a growing file, appending only new data")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--code-bit-length', type=int, default=12)
+    parser.add_argument('--max-dict-size', type=int, default=None)
+    args = parser.parse_args()
+    max_dict_size = args.max_dict_size or 1 << args.code_bit_length
+    compressed = update_file(args.input, args.output, args.code_bit_length, max_dict_size)
+    print(f"Compressed {compressed} new bytes into '{args.output}'")
@@ -0,0 +1,425 @@
+from array import array
+from compact_dictionary import CompactDictionary, EMPTY, ROOT_ENTRIES
+
+# Default number of input bytes processed per streaming step.
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class LZWEncoder:
+    """
+    Incremental LZW encoder over bytes.
+
+    Feeding the input in pieces produces the same codes as `lzw_compress`
+    on the whole input, so chunked output stays compatible with the
+    existing `.lzw` files.
+
+    By default the dictionary is a dict keyed by prefix code and byte,
+    which is about twice as fast as a CompactDictionary but whose size
+    cannot be planned exactly; `compact` selects the CompactDictionary
+    for runs under a memory budget.
+
+    Parameters:
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        dictionary (CompactDictionary, optional): Dictionary to continue
+                                                  from, e.g. one restored
+                                                  from a checkpoint.
+        compact (bool): Keep the dictionary in a CompactDictionary.
+    """
+
+    def __init__(self, max_dict_size=None, dictionary=None, compact=False):
+        self.max_dict_size = max_dict_size
+        self.w = EMPTY  # Code of the pending sequence
+        if compact:
+            self.dictionary = dictionary if dictionary is not None else CompactDictionary(max_dict_size)
+            self.codes = None
+            return
+        self.dictionary = None
+        self.codes = {}  # (prefix << 8) | byte -> code, for every non-root entry
+        self.size = ROOT_ENTRIES
+        if dictionary is not None:
+            prefix = dictionary.prefix
+            suffix = dictionary.suffix
+            self.size = len(dictionary)
+            for code in range(ROOT_ENTRIES, self.size):
+                self.codes[(prefix[code] << 8) | suffix[code]] = code
+
+    def __len__(self):
+        """
+        Return the number of dictionary entries.
+        """
+        return self.size if self.codes is not None else len(self.dictionary)
+
+    def entries(self):
+        """
+        Return the dictionary as prefix codes and suffix bytes in code order,
+        the buffers of a CompactDictionary holding the same entries.
+
+        Returns:
+            Tuple[array, array]: The prefix ('i') and suffix ('B') buffers.
+        """
+        if self.codes is None:
+            size = len(self.dictionary)
+            return self.dictionary.prefix[:size], self.dictionary.suffix[:size]
+        prefix = array('i', [EMPTY]) * self.size
+        suffix = array('B', range(ROOT_ENTRIES)) + array('B', bytes(self.size - ROOT_ENTRIES))
+        for key, code in self.codes.items():
+            prefix[code] = key >> 8
+            suffix[code] = key & 0xFF
+        return prefix, suffix
+
+    def encode(self, data):
+        """
+        Encode a piece of input.
+
+        Parameters:
+            data (bytes): The next input bytes.
+
+        Returns:
+            array: The codes completed by this piece.
+        """
+        if self.codes is None:
+            return self._encode_compact(data)
+        table = self.codes
+        get = table.get
+        codes = array('i')
+        emit = codes.append
+        w = self.w
+        size = self.size
+        limit = self.max_dict_size
+        if limit is None:
+            limit = 1 << 62
+        for byte in data:
+            if w < 0:
+                w = byte
+                continue
+            key = (w << 8) | byte
+            code = get(key)
+            if code is not None:
+                w = code
+            else:
+                emit(w)
+                if size < limit:
+                    table[key] = size
+                    size += 1
+                w = byte
+        self.w = w
+        self.size = size
+        return codes
+
+    def _encode_compact(self, data):
+        dictionary = self.dictionary
+        lookup = dictionary.lookup
+        codes = array('i')
+        w = self.w
+        for byte in data:
+            if w < 0:
+                w = byte
+                continue
+            code = lookup(w, byte)
+            if code >= 0:
+                w = code
+            else:
+                codes.append(w)
+                if dictionary.can_add():
+                    dictionary.add(w, byte)
+                w = byte
+        self.w = w
+        return codes
+
+    def flush(self):
+        """
+        Emit the pending sequence, if any.
+
+        The dictionary is kept, so encoding can continue afterwards; the
+        matching decoder must call `LZWDecoder.reset_block` at this point.
+
+        Returns:
+            array: The codes emitted.
+        """
+        codes = array('i')
+        if self.w >= 0:
+            codes.append(self.w)
+            self.w = EMPTY
+        return codes
+
+
+class LZWDecoder:
+    """
+    Incremental LZW decoder, the counterpart of `LZWEncoder`.
+
+    By default every entry is kept as its bytes in a list, which is fast
+    but grows with the length of the entries; `compact` selects a
+    CompactDictionary, whose footprint is fixed by `max_dict_size`, for
+    runs under a memory budget.
+
+    Parameters:
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        compact (bool): Keep the dictionary in a CompactDictionary.
+    """
+
+    def __init__(self, max_dict_size=None, compact=False):
+        self.max_dict_size = max_dict_size
+        if compact:
+            self.dictionary = CompactDictionary(max_dict_size, indexed=False)
+            self.table = None
+        else:
+            self.dictionary = None
+            self.table = [bytes([i]) for i in range(ROOT_ENTRIES)]
+        self.prev = EMPTY  # Previous code
+        self.w = b''       # Previous entry
+
+    def decode(self, codes, sink=None, sink_threshold=DEFAULT_CHUNK_SIZE):
+        """
+        Decode a piece of the code stream.
+
+        Parameters:
+            codes (Iterable[int]): The next codes.
+            sink (callable, optional): Called with the decoded bytes whenever
+                                       `sink_threshold` bytes are buffered,
+                                       bounding the output buffer.
+            sink_threshold (int): Buffer size that triggers `sink`.
+
+        Returns:
+            bytes: The decoded bytes not yet passed to `sink`.
+        """
+        if self.table is None:
+            return self._decode_compact(codes, sink, sink_threshold)
+        table = self.table
+        add = table.append
+        limit = self.max_dict_size
+        if limit is None:
+            limit = 1 << 62
+        out = bytearray()
+        prev = self.prev
+        w = self.w
+        for k in codes:
+            size = len(table)
+            if k < size:
+                entry = table[k]
+            elif k == size and prev >= 0:
+                entry = w + w[:1]
+            else:
+                raise ValueError(f"Bad compressed k: {k}")
+            out += entry
+
+            # Add w+entry[0] to the dictionary.
+            if prev >= 0 and size < limit:
+                add(w + entry[:1])
+
+            prev = k
+            w = entry
+            if sink is not None and len(out) >= sink_threshold:
+                sink(bytes(out))
+                out.clear()
+        self.prev = prev
+        self.w = w
+        return bytes(out)
+
+    def _decode_compact(self, codes, sink, sink_threshold):
+        dictionary = self.dictionary
+        expand = dictionary.expand
+        out = bytearray()
+        prev = self.prev
+        w = self.w
+        for k in codes:
+            size = len(dictionary)
+            if k < size:
+                entry = expand(k)
+            elif k == size and prev >= 0:
+                entry = w + w[:1]
+            else:
+                raise ValueError(f"Bad compressed k: {k}")
+            out += entry
+
+            # Add w+entry[0] to the dictionary.
+            if prev >= 0 and dictionary.can_add():
+                dictionary.add(prev, entry[0])
+
+            prev = k
+            w = entry
+            if sink is not None and len(out) >= sink_threshold:
+                sink(bytes(out))
+                out.clear()
+        self.prev = prev
+        self.w = w
+        return bytes(out)
+
+    def reset_block(self):
+        """
+        Start a new block after a flush point of the encoder.
+        """
+        self.prev = EMPTY
+        self.w = b''
+
+
+class BitWriter:
+    """
+    Pack codes of a fixed bit length into bytes, most significant bit first.
+
+    Parameters:
+        code_bit_length (int): Number of bits used to represent each code.
+    """
+
+    def __init__(self, code_bit_length):
+        self.code_bit_length = code_bit_length
+        self.max_code = (1 << code_bit_length) - 1
+        self.buffer = 0
+        self.bits_in_buffer = 0
+
+    def pack(self, codes):
+        """
+        Pack codes, keeping incomplete trailing bits for the next call.
+
+        Parameters:
+            codes (Iterable[int]): The codes to pack.
+
+        Returns:
+            bytes: The completed bytes.
+        """
+        code_bit_length = self.code_bit_length
+        max_code = self.max_code
+        buffer = self.buffer
+        bits_in_buffer = self.bits_in_buffer
+        out = bytearray()
+        for code in codes:
+            if code > max_code:
+                raise ValueError(f"Code {code} exceeds the maximum value for {code_bit_length} bits")
+            buffer = (buffer << code_bit_length) | code
+            bits_in_buffer += code_bit_length
+            while bits_in_buffer >= 8:
+                bits_in_buffer -= 8
+                out.append((buffer >> bits_in_buffer) & 0xFF)
+            buffer &= (1 << bits_in_buffer) - 1
+        self.buffer = buffer
+        self.bits_in_buffer = bits_in_buffer
+        return bytes(out)
+
+    def flush(self):
+        """
+        Pad the remaining bits with zeros to a whole byte.
+
+        Returns:
+            bytes: The final byte, or b'' if the output is already aligned.
+        """
+        if self.bits_in_buffer == 0:
+            return b''
+        byte = (self.buffer << (8 - self.bits_in_buffer)) & 0xFF
+        self.buffer = 0
+        self.bits_in_buffer = 0
+        return bytes([byte])
+
+
+class BitReader:
+    """
+    Unpack fixed bit length codes written by `BitWriter`.
+
+    Parameters:
+        code_bit_length (int): Number of bits used to represent each code.
+    """
+
+    def __init__(self, code_bit_length):
+        self.code_bit_length = code_bit_length
+        self.max_code = (1 << code_bit_length) - 1
+        self.buffer = 0
+        self.bits_in_buffer = 0
+
+    def unpack(self, data):
+        """
+        Unpack the codes completed by `data`.
+
+        Parameters:
+            data (bytes): The next packed bytes.
+
+        Returns:
+            array: The codes.
+        """
+        code_bit_length = self.code_bit_length
+        max_code = self.max_code
+        buffer = self.buffer
+        bits_in_buffer = self.bits_in_buffer
+        codes = array('i')
+        for byte in data:
+            buffer = (buffer << 8) | byte
+            bits_in_buffer += 8
+            if bits_in_buffer >= code_bit_length:
+                bits_in_buffer -= code_bit_length
+                codes.append((buffer >> bits_in_buffer) & max_code)
+                buffer &= (1 << bits_in_buffer) - 1
+        self.buffer = buffer
+        self.bits_in_buffer = bits_in_buffer
+        return codes
+
+    def align(self):
+        """
+        Discard the zero padding written by `BitWriter.flush`.
+        """
+        self.buffer = 0
+        self.bits_in_buffer = 0
+
+
+def compress_file_streaming(input_path, output_path, code_bit_length,
+                            max_dict_size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Compress a file in chunks without holding the input or the codes in memory.
+
+    The output is identical to `lzw_compress` followed by
+    `save_compressed_file` for 8-bit input.
+
+    Parameters:
+        input_path (str): The file to compress.
+        output_path (str): The `.lzw` file to write.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        chunk_size (int): Number of input bytes read per step.
+
+    Returns:
+        int: Number of input bytes compressed.
+    """
+    # Compact, so that memory stays within the dictionary's planned footprint
+    encoder = LZWEncoder(max_dict_size, compact=True)
+    writer = BitWriter(code_bit_length)
+    total = 0
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            dst.write(writer.pack(encoder.encode(chunk)))
+        dst.write(writer.pack(encoder.flush()))
+        dst.write(writer.flush())
+    return total
+
+
+def decompress_file_streaming(input_path, output_path, code_bit_length,
+                              max_dict_size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decompress a `.lzw` file in chunks, writing the output as it is decoded.
+
+    Parameters:
+        input_path (str): The `.lzw` file to read.
+        output_path (str): The file to write.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        chunk_size (int): Number of compressed bytes read per step; also the
+                          size at which decoded output is written out.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    # Compact, so that memory stays within the dictionary's planned footprint
+    decoder = LZWDecoder(max_dict_size, compact=True)
+    reader = BitReader(code_bit_length)
+    total = 0
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        def sink(data):
+            nonlocal total
+            total += len(data)
+            dst.write(data)
+
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            sink(decoder.decode(reader.unpack(chunk), sink, chunk_size))
+    return total
@@ -0,0 +1,606 @@
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+from lzw_codec import LZWEncoder, LZWDecoder, BitWriter, BitReader, DEFAULT_CHUNK_SIZE
+from entropy import encode_block, decode_block
+from dedup import (DEFAULT_DEDUP_WINDOW_BITS, MIN_DEDUP_WINDOW_BITS, DedupIndex, DedupRestorer,
+                   crc32_combine, parse_recipe)
+
+# Block-format `.lzw` files start with this magic. A legacy headerless file
+# can never start with 0x89: its first code is below 256 and at least 9 bits
+# wide, so its first byte is at most 0x7F.
+MAGIC = b'\x89LZW'
+VERSION = 1
+
+# magic, version, flags, code bit length, dedup window bits (0 = no limit or
+# no dedup; this byte was reserved before dedup windows), max dictionary size (0 = no limit)
+HEADER = struct.Struct('>4sBBBBI')
+
+# original length, payload length, CRC32 of the original data
+BLOCK_HEADER = struct.Struct('>III')
+
+# Stage flags. FLAG_HUFFMAN: block payloads are entropy coded (see entropy.py).
+# FLAG_DEDUP: repeated chunks are stored as references to earlier output of the
+# same stream (see dedup.py).
+FLAG_HUFFMAN = 0x01
+FLAG_DEDUP = 0x02
+KNOWN_FLAGS = FLAG_HUFFMAN | FLAG_DEDUP
+
+# Number of original bytes per block.
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# Code widths a stream header may declare; the decoder sizes its dictionary
+# from them, so anything else is treated as corruption.
+MIN_CODE_BIT_LENGTH = 9
+MAX_CODE_BIT_LENGTH = 24
+
+# Largest dedup window a header may declare.
+MAX_DEDUP_WINDOW_BITS = 48
+
+StreamHeader = namedtuple('StreamHeader', ['version', 'flags', 'code_bit_length', 'max_dict_size',
+                                           'dedup_window_bits'])
+
+
+class CorruptFileError(ValueError):
+    """
+    Raised when a block-format `.lzw` file is truncated or malformed.
+    """
+
+
+class ChecksumError(CorruptFileError):
+    """
+    Raised when a block does not match its stored checksum.
+    """
+
+
+class OperationCancelled(Exception):
+    """
+    Raised when a compression or decompression is cancelled through its
+    `cancel_event`.
+    """
+
+
+def _remove_partial(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_header(f, code_bit_length, max_dict_size=None, flags=0, dedup_window_bits=0):
+    """
+    Write the stream header.
+
+    Parameters:
+        f (file): Binary file object to write to.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        flags (int): Stage flags recorded for the decompressor.
+        dedup_window_bits (int): log2 of the dedup window of FLAG_DEDUP streams.
+    """
+    f.write(HEADER.pack(MAGIC, VERSION, flags, code_bit_length, dedup_window_bits, max_dict_size or 0))
+
+
+def read_header(f):
+    """
+    Read and validate the stream header.
+
+    The code width and dictionary size are checked before any dictionary
+    is allocated from them.
+
+    Parameters:
+        f (file): Binary file object positioned at the start of the stream.
+
+    Returns:
+        StreamHeader: The stream parameters.
+    """
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size or raw[:len(MAGIC)] != MAGIC:
+        raise CorruptFileError("Not a block-format .lzw stream")
+    magic, version, flags, code_bit_length, dedup_window_bits, max_dict_size = HEADER.unpack(raw)
+    if version != VERSION:
+        raise CorruptFileError(f"Unsupported .lzw format version {version}")
+    if flags & ~KNOWN_FLAGS:
+        raise CorruptFileError(f"Unsupported .lzw stage flags {flags:#04x}")
+    if not MIN_CODE_BIT_LENGTH <= code_bit_length <= MAX_CODE_BIT_LENGTH:
+        raise CorruptFileError(f"Invalid code bit length {code_bit_length} in the .lzw header")
+    if max_dict_size > 1 << code_bit_length:
+        raise CorruptFileError(f"Dictionary size {max_dict_size} in the .lzw header does not fit "
+                               f"in {code_bit_length}-bit codes")
+    if dedup_window_bits and not (flags & FLAG_DEDUP
+                                  and MIN_DEDUP_WINDOW_BITS <= dedup_window_bits <= MAX_DEDUP_WINDOW_BITS):
+        raise CorruptFileError(f"Invalid dedup window {dedup_window_bits} in the .lzw header")
+    return StreamHeader(version, flags, code_bit_length, max_dict_size or None, dedup_window_bits)
+
+
+def is_block_format(filename):
+    """
+    Return True if `filename` is a block-format `.lzw` file rather than a
+    legacy headerless one.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_file_header(filename):
+    """
+    Return the StreamHeader of a block-format `.lzw` file.
+    """
+    with open(filename, 'rb') as f:
+        return read_header(f)
+
+
+class BlockWriter:
+    """
+    Write original data as a sequence of checksummed LZW blocks.
+
+    Every block ends at a flush point: the pending sequence is emitted and
+    the codes are padded to a whole byte, but the dictionary carries over.
+    Each block therefore decodes to exactly its own original bytes.
+
+    Parameters:
+        f (file): Binary file object to write to.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        block_size (int): Number of original bytes per block.
+        flags (int): Stage flags recorded in the header.
+        encoder (LZWEncoder, optional): Encoder state at the end of an
+                                        existing stream whose end marker
+                                        was removed; the new blocks
+                                        continue that stream and no
+                                        header is written.
+        dedup_window_bits (int): log2 of how far back dedup references
+                                 may reach, which bounds the dedup index;
+                                 0 for no limit.
+        compact (bool): Keep the dictionary in a CompactDictionary, for
+                        runs under a memory budget.
+    """
+
+    def __init__(self, f, code_bit_length, max_dict_size=None,
+                 block_size=DEFAULT_BLOCK_SIZE, flags=0, encoder=None,
+                 dedup_window_bits=DEFAULT_DEDUP_WINDOW_BITS, compact=False):
+        self.f = f
+        self.code_bit_length = code_bit_length
+        self.max_dict_size = max_dict_size
+        self.block_size = block_size
+        self.flags = flags
+        self.encoder = encoder if encoder is not None else LZWEncoder(max_dict_size, compact=compact)
+        self.dedup = None
+        if flags & FLAG_DEDUP:
+            self.dedup = DedupIndex(dedup_window_bits)
+        else:
+            dedup_window_bits = 0
+        self.pending = bytearray()
+        self.raw_size = 0
+        self.crc = 0
+        if encoder is None:
+            write_header(f, code_bit_length, max_dict_size, flags, dedup_window_bits)
+
+    def write(self, data):
+        """
+        Buffer `data`, writing a block each time `block_size` bytes are pending.
+        """
+        if not self.pending and len(data) == self.block_size:
+            # Whole block straight from the caller, without copying it
+            self._write_block(data)
+            return
+        self.pending += data
+        while len(self.pending) >= self.block_size:
+            block = bytes(self.pending[:self.block_size])
+            del self.pending[:self.block_size]
+            self._write_block(block)
+
+    def flush(self):
+        """
+        Write the pending data as a (possibly short) block.
+        """
+        if self.pending:
+            block = bytes(self.pending)
+            self.pending.clear()
+            self._write_block(block)
+
+    def close(self):
+        """
+        Flush the pending data and write the end-of-stream marker.
+        """
+        self.flush()
+        self.f.write(BLOCK_HEADER.pack(0, 0, 0))
+
+    def encode_payload(self, data):
+        """
+        Return the payload stored for the original bytes of one block.
+
+        With FLAG_DEDUP the payload starts with the block's dedup recipe
+        and only the literal bytes are LZW coded.
+        """
+        recipe = b''
+        if self.dedup is not None:
+            recipe, data = self.dedup.split(data, self.raw_size)
+        codes = self.encoder.encode(data)
+        codes.extend(self.encoder.flush())
+        if self.flags & FLAG_HUFFMAN:
+            return recipe + encode_block(codes, self.code_bit_length)
+        writer = BitWriter(self.code_bit_length)
+        return recipe + writer.pack(codes) + writer.flush()
+
+    def _write_block(self, data):
+        payload = self.encode_payload(data)
+        crc = zlib.crc32(data)
+        self.f.write(BLOCK_HEADER.pack(len(data), len(payload), crc))
+        self.f.write(payload)
+        self.raw_size += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+
+
+class _CheckedSink:
+    """
+    Pass decoded bytes on while counting them and updating their CRC32.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.length = 0
+        self.crc = 0
+
+    def __call__(self, data):
+        self.length += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+        self.sink(data)
+
+    def skip(self, length, crc):
+        """
+        Account for `length` bytes with CRC32 `crc` that are not passed on.
+        """
+        self.length += length
+        self.crc = crc32_combine(self.crc, crc, length)
+
+
+class BlockReader:
+    """
+    Read and check the blocks written by `BlockWriter`.
+
+    Parameters:
+        f (file): Binary file object positioned at the start of the stream.
+        output (file, optional): The file the stream is decoded into,
+                                 opened 'w+b'. Streams with FLAG_DEDUP
+                                 read their references back from it.
+        verify_only (bool): Only check the blocks; dedup references are
+                            then checked by CRC instead of read back.
+        compact (bool): Keep the dictionary in a CompactDictionary, for
+                        runs under a memory budget.
+    """
+
+    def __init__(self, f, output=None, verify_only=False, compact=False):
+        self.f = f
+        self.header = read_header(f)
+        self.decoder = LZWDecoder(self.header.max_dict_size, compact)
+        self.restorer = None
+        if self.header.flags & FLAG_DEDUP:
+            self.restorer = DedupRestorer(output, verify_only, self.header.dedup_window_bits)
+        self.block_index = 0
+        self.position = 0  # Original offset of the next block
+        self.finished = False
+
+    def next_block(self):
+        """
+        Read the next block header and payload.
+
+        Returns:
+            Tuple[int, int, bytes] or None: Original length, stored CRC32 and
+            payload, or None at the end of the stream.
+        """
+        block = self._next_block_header()
+        if block is None:
+            return None
+        raw_len, payload_len, crc = block
+        payload = self.f.read(payload_len)
+        if len(payload) < payload_len:
+            raise CorruptFileError(f"Truncated stream: block {self.block_index} payload is incomplete")
+        return raw_len, crc, payload
+
+    def _next_block_header(self):
+        if self.finished:
+            return None
+        raw = self.f.read(BLOCK_HEADER.size)
+        if len(raw) < BLOCK_HEADER.size:
+            raise CorruptFileError(f"Truncated stream: block {self.block_index} header is incomplete")
+        raw_len, payload_len, crc = BLOCK_HEADER.unpack(raw)
+        if raw_len == 0 and payload_len == 0:
+            self.finished = True
+            return None
+        return raw_len, payload_len, crc
+
+    def decode_block(self, raw_len, crc, payload, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decode one block, passing its original bytes to `sink` in pieces of
+        about `chunk_size` bytes, and check its length and checksum.
+        """
+        checked_sink = _CheckedSink(sink)
+        reader = BitReader(self.header.code_bit_length)
+        self.decoder.reset_block()
+        try:
+            checked_sink(self.decode_payload(payload, reader, checked_sink, chunk_size))
+        except CorruptFileError:
+            raise
+        except ValueError as e:
+            raise CorruptFileError(f"Block {self.block_index} is corrupt: {e}") from e
+        return self._finish_block(checked_sink, raw_len, crc)
+
+    def stream_block(self, raw_len, payload_len, crc, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decode one block of a stream without stage flags while reading its
+        payload in pieces of `chunk_size` bytes, so that neither the payload
+        nor its codes are held whole.
+        """
+        checked_sink = _CheckedSink(sink)
+        reader = BitReader(self.header.code_bit_length)
+        self.decoder.reset_block()
+        remaining = payload_len
+        try:
+            while remaining:
+                piece = self.f.read(min(remaining, chunk_size))
+                if not piece:
+                    raise CorruptFileError(f"Truncated stream: block {self.block_index} payload is incomplete")
+                remaining -= len(piece)
+                checked_sink(self.decoder.decode(reader.unpack(piece), checked_sink, chunk_size))
+        except CorruptFileError:
+            raise
+        except ValueError as e:
+            raise CorruptFileError(f"Block {self.block_index} is corrupt: {e}") from e
+        return self._finish_block(checked_sink, raw_len, crc)
+
+    def _finish_block(self, checked_sink, raw_len, crc):
+        if checked_sink.length != raw_len:
+            raise CorruptFileError(
+                f"Block {self.block_index} decoded to {checked_sink.length} bytes, expected {raw_len}")
+        if checked_sink.crc != crc:
+            raise ChecksumError(
+                f"Block {self.block_index} checksum mismatch: stored {crc:08x}, computed {checked_sink.crc:08x}")
+        self.block_index += 1
+        self.position += raw_len
+        return raw_len
+
+    def decode_payload(self, payload, reader, sink, chunk_size):
+        """
+        Decode the payload of one block, returning the bytes not yet passed
+        to `sink`.
+        """
+        if self.restorer is not None:
+            entries, recipe_len = parse_recipe(payload)
+            payload = payload[recipe_len:]
+        if self.header.flags & FLAG_HUFFMAN:
+            codes = decode_block(payload, self.header.code_bit_length)
+        else:
+            codes = reader.unpack(payload)
+        if self.restorer is None:
+            return self.decoder.decode(codes, sink, chunk_size)
+        literals = self.decoder.decode(codes)
+        return self.restorer.restore(entries, literals, self.position, sink)
+
+    def copy_to(self, sink, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decode every remaining block into `sink`.
+
+        Blocks without stage flags are streamed in pieces of `chunk_size`
+        bytes; Huffman and dedup blocks are decoded whole.
+
+        Returns:
+            int: Number of original bytes decoded.
+        """
+        total = 0
+        if not self.header.flags:
+            while True:
+                block = self._next_block_header()
+                if block is None:
+                    return total
+                total += self.stream_block(*block, sink, chunk_size)
+        while True:
+            block = self.next_block()
+            if block is None:
+                return total
+            total += self.decode_block(*block, sink, chunk_size)
+
+
+def compress_stream(src, dst, code_bit_length, max_dict_size=None, block_size=DEFAULT_BLOCK_SIZE,
+                    flags=0, progress=None, cancel_event=None, dedup_window_bits=DEFAULT_DEDUP_WINDOW_BITS,
+                    compact=False):
+    """
+    Compress everything readable from `src` into a block-format stream.
+
+    Parameters:
+        src (file): Binary file object to read.
+        dst (file): Binary file object to write.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        block_size (int): Number of original bytes per block.
+        flags (int): Stage flags recorded in the header.
+        progress (callable, optional): Called with the number of original
+                                       bytes compressed after each block.
+        cancel_event (threading.Event, optional): Checked after each block;
+                                                  when set, OperationCancelled
+                                                  is raised.
+        dedup_window_bits (int): log2 of the dedup window with FLAG_DEDUP.
+        compact (bool): Keep the dictionary in a CompactDictionary, whose
+                        footprint `plan_compression` budgets for.
+
+    Returns:
+        Tuple[int, int]: Number of original bytes and their CRC32.
+    """
+    writer = BlockWriter(dst, code_bit_length, max_dict_size, block_size, flags,
+                         dedup_window_bits=dedup_window_bits, compact=compact)
+    while True:
+        chunk = src.read(block_size)
+        if not chunk:
+            break
+        writer.write(chunk)
+        if progress is not None:
+            progress(writer.raw_size)
+        if cancel_event is not None and cancel_event.is_set():
+            raise OperationCancelled("Compression cancelled")
+    writer.close()
+    return writer.raw_size, writer.crc
+
+
+def decompress_stream(src, dst, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, cancel_event=None,
+                      compact=False):
+    """
+    Decompress a block-format stream from `src` into `dst`.
+
+    Parameters:
+        src (file): Binary file object positioned at the start of the stream.
+        dst (file): Binary file object to write. Streams with FLAG_DEDUP
+                    also read earlier output back, so it must then be
+                    readable and seekable ('w+b').
+        chunk_size (int): Size of the pieces written to `dst`.
+        progress (callable, optional): Called with the number of original
+                                       bytes written after each piece.
+        cancel_event (threading.Event, optional): Checked after each piece;
+                                                  when set, OperationCancelled
+                                                  is raised.
+        compact (bool): Keep the dictionary in a CompactDictionary, whose
+                        footprint `plan_decompression` budgets for.
+
+    Returns:
+        int: Number of original bytes written.
+    """
+    if progress is None and cancel_event is None:
+        return BlockReader(src, dst, compact=compact).copy_to(dst.write, chunk_size)
+
+    written = 0
+
+    def sink(data):
+        nonlocal written
+        dst.write(data)
+        written += len(data)
+        if progress is not None:
+            progress(written)
+        if cancel_event is not None and cancel_event.is_set():
+            raise OperationCancelled("Decompression cancelled")
+
+    return BlockReader(src, dst, compact=compact).copy_to(sink, chunk_size)
+
+
+def verify_stream(src, scratch_size=1 << 16):
+    """
+    Check every block of a stream without keeping or writing its output.
+
+    Decoded bytes go through a rolling scratch buffer of about
+    `scratch_size` bytes that is only fed to the checksum.
+
+    Parameters:
+        src (file): Binary file object positioned at the start of the stream.
+        scratch_size (int): Size of the scratch buffer.
+
+    Returns:
+        dict: Number of blocks and of original bytes checked.
+
+    Raises:
+        CorruptFileError: If the stream is malformed or a checksum differs.
+    """
+    reader = BlockReader(src, verify_only=True)
+    original_size = reader.copy_to(lambda data: None, scratch_size)
+    return {'Blocks': reader.block_index, 'Original Size (bytes)': original_size}
+
+
+def compress_file(input_path, output_path, code_bit_length, max_dict_size=None, block_size=DEFAULT_BLOCK_SIZE,
+                  flags=0, progress=None, cancel_event=None, dedup_window_bits=DEFAULT_DEDUP_WINDOW_BITS,
+                  compact=False):
+    """
+    Compress a file into a block-format `.lzw` file.
+
+    If cancelled or interrupted by an error, the partial output file is
+    removed.
+
+    Returns:
+        Tuple[int, int]: Number of original bytes and their CRC32.
+    """
+    try:
+        with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+            return compress_stream(src, dst, code_bit_length, max_dict_size, block_size, flags,
+                                   progress, cancel_event, dedup_window_bits, compact)
+    except Exception:
+        _remove_partial(output_path)
+        raise
+
+
+def decompress_file(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                    progress=None, cancel_event=None, compact=False):
+    """
+    Decompress a block-format `.lzw` file.
+
+    If cancelled or interrupted by an error, the partial output file is
+    removed.
+
+    Returns:
+        int: Number of original bytes written.
+    """
+    try:
+        # Opened for reading too, for the references of dedup streams
+        with open(input_path, 'rb') as src, open(output_path, 'w+b') as dst:
+            return decompress_stream(src, dst, chunk_size, progress, cancel_event, compact)
+    except Exception:
+        _remove_partial(output_path)
+        raise
+
+
+def scan_stream(f):
+    """
+    Read only the header and block headers of the stream starting at the
+    current position of `f`, seeking over the payloads.
+
+    Returns:
+        Tuple[StreamHeader, int, int]: The header, the total original
+        length and the original length of the largest block.
+    """
+    header = read_header(f)
+    total = 0
+    largest = 0
+    while True:
+        raw = f.read(BLOCK_HEADER.size)
+        if len(raw) < BLOCK_HEADER.size:
+            raise CorruptFileError("Truncated stream: a block header is incomplete")
+        raw_len, payload_len, _ = BLOCK_HEADER.unpack(raw)
+        if raw_len == 0 and payload_len == 0:
+            return header, total, largest
+        total += raw_len
+        largest = max(largest, raw_len)
+        f.seek(payload_len, os.SEEK_CUR)
+
+
+def scan_blocks(filename):
+    """
+    Read only the block headers of a block-format `.lzw` file.
+
+    Returns:
+        Tuple[int, int]: The total original length and the original length
+        of the largest block.
+    """
+    with open(filename, 'rb') as f:
+        _, total, largest = scan_stream(f)
+        return total, largest
+
+
+def verify_file(filename, scratch_size=1 << 16):
+    """
+    Check a block-format `.lzw` file without writing its output.
+
+    Returns:
+        dict: Number of blocks and of original bytes checked.
+    """
+    with open(filename, 'rb') as f:
+        return verify_stream(f, scratch_size)
+
+
+if __name__ == "__main__":
+    # Usage: python lzw_format.py FILE.lzw [FILE.lzw ...]
+    failed = 0
+    for path in sys.argv[1:]:
+        try:
+            report = verify_file(path)
+            print(f"OK      {path} ({report['Blocks']} blocks, {report['Original Size (bytes)']} bytes)")
+        except (OSError, CorruptFileError) as e:
+            failed += 1
+            print(f"FAILED  {path}: {e}")
+    sys.exit(1 if failed else 0)
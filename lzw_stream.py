@@ -0,0 +1,230 @@
+import socket
+import sys
+from lzw_format import FLAG_DEDUP, BlockReader, BlockWriter
+
+# Original bytes per frame when the writer is not flushed earlier. Smaller
+# than the file default so that a busy stream is delivered in small steps.
+DEFAULT_FRAME_SIZE = 64 * 1024
+
+
+def _as_file(target, mode):
+    """
+    Return a binary file object for a socket, or `target` itself if it is
+    already file-like (a pipe, a BytesIO or an open file).
+    """
+    if isinstance(target, socket.socket):
+        return target.makefile(mode)
+    return target
+
+
+class LZWStreamWriter:
+    """
+    Compress data written to a socket or pipe as a framed block stream.
+
+    The stream uses the block format of `.lzw` files. Each frame is one
+    block, so `flush` is a flush point: everything written so far is
+    emitted and byte-aligned and reaches the peer, while the dictionary
+    carries over to later frames.
+
+    Parameters:
+        target (socket.socket or file): Where the stream is written.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary;
+                                       defaults to 2^code_bit_length, so a
+                                       long-lived stream never outgrows
+                                       its code width.
+        frame_size (int): Original bytes after which a frame is sent
+                          without an explicit flush.
+        flags (int): Stage flags recorded in the header; FLAG_DEDUP is
+                     not supported.
+    """
+
+    def __init__(self, target, code_bit_length, max_dict_size=None,
+                 frame_size=DEFAULT_FRAME_SIZE, flags=0):
+        if flags & FLAG_DEDUP:
+            raise ValueError("Dedup streams refer back to earlier output, which a stream reader "
+                             "cannot read back; compress into a file with compress_stream")
+        self.target = target
+        self.f = _as_file(target, 'wb')
+        self.writer = BlockWriter(self.f, code_bit_length, max_dict_size or 1 << code_bit_length,
+                                  frame_size, flags)
+        self.closed = False
+        self.f.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, data):
+        """
+        Compress `data`; full frames are sent as they complete.
+
+        Returns:
+            int: Number of bytes accepted.
+        """
+        if self.closed:
+            raise ValueError("write to a closed LZWStreamWriter")
+        sent = self.writer.raw_size
+        self.writer.write(data)
+        if self.writer.raw_size != sent:
+            # A frame was completed; push it through the transport's buffer
+            self.f.flush()
+        return len(data)
+
+    def flush(self):
+        """
+        Send everything written so far as a frame and flush the transport.
+        """
+        if self.closed:
+            raise ValueError("flush of a closed LZWStreamWriter")
+        self.writer.flush()
+        self.f.flush()
+
+    def close(self):
+        """
+        Send the pending data and the end-of-stream marker.
+
+        For a socket, the write side is shut down so the peer sees the end
+        of the stream; the socket itself stays open.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.writer.close()
+        self.f.flush()
+        if self.f is not self.target:
+            self.f.close()
+            self.target.shutdown(socket.SHUT_WR)
+
+
+class LZWStreamReader:
+    """
+    Decompress a framed block stream from a socket or pipe as frames arrive.
+
+    Each frame is decoded and checked as soon as it has been received, so
+    data is delivered at every flush point of the writer.
+
+    Parameters:
+        source (socket.socket or file): Where the stream is read from.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.f = _as_file(source, 'rb')
+        self.reader = BlockReader(self.f)
+        if self.reader.header.flags & FLAG_DEDUP:
+            raise ValueError("Dedup streams refer back to earlier output; decompress them "
+                             "into a seekable file with decompress_stream")
+        self.buffer = bytearray()
+        self.eof = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if not frame:
+                return
+            yield frame
+
+    @property
+    def header(self):
+        return self.reader.header
+
+    def read_frame(self):
+        """
+        Wait for the next frame and return its original bytes, or b'' at
+        the end of the stream.
+        """
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+        if self.eof:
+            return b''
+        block = self.reader.next_block()
+        if block is None:
+            self.eof = True
+            return b''
+        pieces = []
+        self.reader.decode_block(*block, pieces.append)
+        return b''.join(pieces)
+
+    def read(self, size=-1):
+        """
+        Read up to `size` original bytes, waiting for at most one frame.
+
+        With a negative `size`, read until the end of the stream.
+
+        Returns:
+            bytes: The data, or b'' at the end of the stream.
+        """
+        if size is None or size < 0:
+            pieces = [bytes(self.buffer)]
+            self.buffer.clear()
+            pieces.extend(self)
+            return b''.join(pieces)
+        if not self.buffer:
+            self.buffer += self.read_frame()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def close(self):
+        if self.f is not self.source:
+            self.f.close()
+
+
+def open_stream(target, mode='rb', code_bit_length=16, max_dict_size=None,
+                frame_size=DEFAULT_FRAME_SIZE, flags=0):
+    """
+    Wrap a socket or pipe in an LZWStreamReader ('rb') or LZWStreamWriter ('wb').
+    """
+    if mode == 'rb':
+        return LZWStreamReader(target)
+    if mode == 'wb':
+        return LZWStreamWriter(target, code_bit_length, max_dict_size, frame_size, flags)
+    raise ValueError(f"Invalid mode {mode!r}; expected 'rb' or 'wb'")
+
+
+if __name__ == "__main__":
+    # Self-check over a socket pair: full frames must reach the reader
+    # without an explicit flush, and a flush must deliver a partial frame.
+    import threading
+    left, right = socket.socketpair()
+    received = []
+    arrived = threading.Event()
+
+    def receive():
+        with LZWStreamReader(right) as stream:
+            for frame in stream:
+                received.append(frame)
+                arrived.set()
+
+    writer = LZWStreamWriter(left, 12, frame_size=4096)
+    thread = threading.Thread(target=receive, daemon=True)
+    thread.start()
+    for i in range(3):
+        arrived.clear()
+        writer.write(bytes([65 + i]) * 4096)
+        if not arrived.wait(5):
+            sys.exit(f"FAILED  frame {i} was not delivered without a flush")
+    arrived.clear()
+    writer.write(b'tail')
+    writer.flush()
+    if not arrived.wait(5):
+        sys.exit("FAILED  flush did not deliver the partial frame")
+    writer.close()
+    thread.join(5)
+    left.close()
+    right.close()
+    expected = [b'A' * 4096, b'B' * 4096, b'C' * 4096, b'tail']
+    if received != expected:
+        sys.exit("FAILED  frames differ from what was written")
+    print(f"OK      {len(received)} frames delivered as written")
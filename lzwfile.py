@@ -0,0 +1,262 @@
+import builtins
+import io
+import os
+import tempfile
+from dedup import DedupRestorer
+from lzw_format import DEFAULT_BLOCK_SIZE, FLAG_DEDUP, BlockReader, BlockWriter
+
+READ, WRITE = 1, 2
+
+# Code width used when none is given; the dictionary fills the code space.
+DEFAULT_CODE_BIT_LENGTH = 16
+
+# Size of the read buffer in front of the block decoder.
+READ_BUFFER_SIZE = 1 << 20
+
+
+class _LZWReader(io.RawIOBase):
+    """
+    Raw reader that decodes a block-format stream one block at a time.
+
+    Only the current block is held in memory. Streams with FLAG_DEDUP keep
+    their decoded output in an anonymous temporary file, from which
+    references to earlier data are read back.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._reader = BlockReader(fp)
+        self._history = None
+        if self._reader.header.flags & FLAG_DEDUP:
+            self._history = tempfile.TemporaryFile()
+            self._reader.restorer = DedupRestorer(self._history,
+                                                  window_bits=self._reader.header.dedup_window_bits)
+        self._block = memoryview(b'')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._block):
+            if not self._next_block():
+                return 0
+        with memoryview(b) as view, view.cast('B') as byte_view:
+            n = min(len(byte_view), len(self._block) - self._pos)
+            byte_view[:n] = self._block[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def _next_block(self):
+        block = self._reader.next_block()
+        if block is None:
+            return False
+        pieces = []
+        self._reader.decode_block(*block, pieces.append)
+        data = b''.join(pieces)
+        if self._history is not None:
+            self._history.seek(0, os.SEEK_END)
+            self._history.write(data)
+        self._block = memoryview(data)
+        self._pos = 0
+        return True
+
+    def close(self):
+        if self._history is not None:
+            self._history.close()
+            self._history = None
+        super().close()
+
+
+class LZWFile(io.BufferedIOBase):
+    """
+    File object that reads or writes a block-format `.lzw` stream, modelled
+    on `gzip.GzipFile`.
+
+    Reading goes through an `io.BufferedReader`, so `read`, `readinto`,
+    `readline`, `peek` and line iteration work without decoding more than
+    one block ahead. Writing buffers up to `block_size` bytes and writes a
+    checksummed block each time the buffer fills. It can be passed to
+    `shutil.copyfileobj`, wrapped in `io.TextIOWrapper` (see `open`) and
+    used as a context manager.
+
+    Parameters:
+        filename (str, optional): The file to open, unless `fileobj` is given.
+        mode (str): 'rb', 'wb' or 'xb' ('r', 'w' and 'x' are accepted).
+        code_bit_length (int): Number of bits per code when writing.
+        max_dict_size (int, optional): Dictionary limit when writing;
+                                       defaults to 2^code_bit_length.
+        fileobj (file, optional): An open binary file object to use instead.
+        block_size (int): Number of original bytes per block when writing.
+        flags (int): Stage flags when writing, e.g. FLAG_HUFFMAN.
+    """
+
+    myfileobj = None
+
+    def __init__(self, filename=None, mode=None, code_bit_length=DEFAULT_CODE_BIT_LENGTH,
+                 max_dict_size=None, fileobj=None, block_size=DEFAULT_BLOCK_SIZE, flags=0):
+        if mode and ('t' in mode or 'U' in mode):
+            raise ValueError(f"Invalid mode: {mode!r}")
+        if mode and 'b' not in mode:
+            mode += 'b'
+        if fileobj is None:
+            fileobj = self.myfileobj = builtins.open(filename, mode or 'rb')
+        if filename is None:
+            filename = getattr(fileobj, 'name', '')
+            if not isinstance(filename, (str, bytes)):
+                filename = ''
+        if mode is None:
+            mode = getattr(fileobj, 'mode', 'rb')
+
+        try:
+            if mode.startswith('r'):
+                self.mode = READ
+                self._buffer = io.BufferedReader(_LZWReader(fileobj), READ_BUFFER_SIZE)
+            elif mode.startswith(('w', 'x')):
+                self.mode = WRITE
+                self._writer = BlockWriter(fileobj, code_bit_length,
+                                           max_dict_size or 1 << code_bit_length, block_size, flags)
+            else:
+                raise ValueError(f"Invalid mode: {mode!r}")
+        except BaseException:
+            if self.myfileobj is not None:
+                self.myfileobj.close()
+                self.myfileobj = None
+            raise
+
+        self.name = filename
+        self.fileobj = fileobj
+
+    def __repr__(self):
+        return f"<lzwfile {self.name!r} {hex(id(self))}>"
+
+    @property
+    def closed(self):
+        return self.fileobj is None
+
+    def _check_not_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+    def _check_mode(self, mode):
+        self._check_not_closed()
+        if self.mode != mode:
+            if mode == READ:
+                raise io.UnsupportedOperation("read() on write-only LZWFile object")
+            raise io.UnsupportedOperation("write() on read-only LZWFile object")
+
+    def readable(self):
+        return self.mode == READ
+
+    def writable(self):
+        return self.mode == WRITE
+
+    def seekable(self):
+        return False
+
+    def fileno(self):
+        return self.fileobj.fileno()
+
+    def read(self, size=-1):
+        self._check_mode(READ)
+        return self._buffer.read(size)
+
+    def read1(self, size=-1):
+        self._check_mode(READ)
+        return self._buffer.read1(size)
+
+    def readinto(self, b):
+        self._check_mode(READ)
+        return self._buffer.readinto(b)
+
+    def readinto1(self, b):
+        self._check_mode(READ)
+        return self._buffer.readinto1(b)
+
+    def peek(self, n=0):
+        self._check_mode(READ)
+        return self._buffer.peek(n)
+
+    def readline(self, size=-1):
+        self._check_mode(READ)
+        return self._buffer.readline(size)
+
+    def write(self, data):
+        """
+        Compress `data`.
+
+        Returns:
+            int: Number of uncompressed bytes written.
+        """
+        self._check_mode(WRITE)
+        if not isinstance(data, (bytes, bytearray)):
+            data = memoryview(data).cast('B')
+        self._writer.write(data)
+        return len(data)
+
+    def flush(self):
+        """
+        When writing, end the current block so that everything written so
+        far can be decoded, and flush the underlying file.
+        """
+        self._check_not_closed()
+        if self.mode == WRITE:
+            self._writer.flush()
+            self.fileobj.flush()
+
+    def close(self):
+        fileobj = self.fileobj
+        if fileobj is None:
+            return
+        try:
+            if self.mode == WRITE:
+                self._writer.close()
+            else:
+                self._buffer.close()
+        finally:
+            self.fileobj = None
+            myfileobj = self.myfileobj
+            if myfileobj is not None:
+                self.myfileobj = None
+                myfileobj.close()
+
+
+def open(filename, mode='rb', code_bit_length=DEFAULT_CODE_BIT_LENGTH, max_dict_size=None,
+         flags=0, encoding=None, errors=None, newline=None):
+    """
+    Open a block-format `.lzw` file in binary or text mode, like `gzip.open`.
+
+    Parameters:
+        filename (str or file): A path, or an open binary file object.
+        mode (str): 'r', 'rb', 'w', 'wb', 'x' or 'xb' for binary, or
+                    'rt', 'wt' or 'xt' for text.
+        code_bit_length (int): Number of bits per code when writing.
+        max_dict_size (int, optional): Dictionary limit when writing.
+        flags (int): Stage flags when writing.
+        encoding, errors, newline: Passed to io.TextIOWrapper in text mode.
+
+    Returns:
+        LZWFile or io.TextIOWrapper: The open file.
+    """
+    if 't' in mode:
+        if 'b' in mode:
+            raise ValueError(f"Invalid mode: {mode!r}")
+    else:
+        if encoding is not None:
+            raise ValueError("Argument 'encoding' not supported in binary mode")
+        if errors is not None:
+            raise ValueError("Argument 'errors' not supported in binary mode")
+        if newline is not None:
+            raise ValueError("Argument 'newline' not supported in binary mode")
+
+    lzw_mode = mode.replace('t', '')
+    if isinstance(filename, (str, bytes, os.PathLike)):
+        binary_file = LZWFile(filename, lzw_mode, code_bit_length, max_dict_size, flags=flags)
+    elif hasattr(filename, 'read') or hasattr(filename, 'write'):
+        binary_file = LZWFile(None, lzw_mode, code_bit_length, max_dict_size, filename, flags=flags)
+    else:
+        raise TypeError("filename must be a str or bytes object, or a file")
+
+    if 't' in mode:
+        return io.TextIOWrapper(binary_file, encoding, errors, newline)
+    return binary_file
@@ -0,0 +1,252 @@
+import sys
+from collections import namedtuple
+from array import array
+from compact_dictionary import CompactDictionary, ROOT_ENTRIES
+from dedup import DEFAULT_DEDUP_WINDOW_BITS, MIN_DEDUP_WINDOW_BITS, DedupIndex
+from entropy import TABLE_BITS
+from lzw_codec import DEFAULT_CHUNK_SIZE
+
+# Smallest streaming chunk worth using; below this per-chunk overhead dominates.
+MIN_CHUNK_SIZE = 4096
+
+# Growth slack of the bytearray/array buffers filled while streaming.
+_BUFFER_SLACK = 9 / 8
+
+# Measured footprint of the Huffman stage per distinct code of a block (its
+# count, length and code table entries), with room for dict resizes.
+_HUFFMAN_SYMBOL_BYTES = 352
+
+# With dedup, at most this fraction of the budget goes to the dedup index;
+# the window is shrunk until its index fits.
+DEDUP_BUDGET_SHARE = 1 / 4
+
+MemoryPlan = namedtuple('MemoryPlan', [
+    'max_dict_size',     # Dictionary limit to use (None only if no budget applies)
+    'chunk_size',        # Streaming chunk size in bytes
+    'dictionary_bytes',  # Footprint of the dictionary at its limit
+    'buffer_bytes',      # Footprint of the streaming buffers for one chunk
+    'dedup_window_bits', # log2 of the dedup window (None without dedup)
+    'dedup_bytes',       # Footprint of the dedup index at its limit
+], defaults=(None, 0))
+
+
+class MemoryBudgetError(ValueError):
+    """
+    Raised when a job cannot run within the requested memory budget.
+    """
+
+
+def _container_overhead():
+    return sys.getsizeof(b'') + sys.getsizeof(bytearray()) + sys.getsizeof(array('i'))
+
+
+def compression_buffer_bytes(chunk_size, code_bit_length, dedup=False):
+    """
+    Return the memory used by the buffers that stream one compression chunk.
+
+    This covers the input chunk, the codes it produces (at most one per
+    input byte) and the packed output bytes, plus with `dedup` the copy of
+    the chunk's literal bytes.
+    """
+    codes = chunk_size * array('i').itemsize
+    packed = (chunk_size * code_bit_length + 7) // 8
+    literals = chunk_size if dedup else 0
+    return int(chunk_size + (codes + packed + literals) * _BUFFER_SLACK) + _container_overhead()
+
+
+def decompression_buffer_bytes(chunk_size, code_bit_length, max_dict_size):
+    """
+    Return the memory used by the buffers that stream one decompression chunk.
+
+    This covers the compressed chunk, its codes, the output buffer and the
+    copy of it handed to the sink, and the longest dictionary entry, which
+    may overshoot the output buffer and is kept as the previous entry.
+    """
+    codes = (chunk_size * 8 // code_bit_length) * array('i').itemsize
+    longest_entry = max(max_dict_size - ROOT_ENTRIES, 0) + 1
+    output = chunk_size + longest_entry
+    return (int(chunk_size + (codes + output) * _BUFFER_SLACK) + output + 2 * longest_entry
+            + _container_overhead())
+
+
+def whole_block_bytes(block_size, code_bit_length):
+    """
+    Return the memory used to decode one block that cannot be streamed.
+
+    Huffman and dedup blocks are decoded whole: this covers the payload and
+    its padded copy, the codes (at most one per original byte), the decoded
+    literals and the rebuilt block.
+    """
+    codes = block_size * array('i').itemsize
+    payload = (block_size * code_bit_length + 7) // 8
+    return int((2 * payload + codes + 2 * block_size) * _BUFFER_SLACK) + _container_overhead()
+
+
+def huffman_table_bytes(block_size, max_dict_size):
+    """
+    Return the memory used by the Huffman tables of one block.
+
+    A block has at most one distinct code per original byte and per
+    dictionary entry; the decoder adds its fixed direct lookup table.
+    """
+    symbols = min(block_size, max_dict_size)
+    return symbols * _HUFFMAN_SYMBOL_BYTES + 2 * sys.getsizeof([0] * (1 << TABLE_BITS))
+
+
+def _largest_chunk(budget, cost):
+    """
+    Return the largest chunk size in [MIN_CHUNK_SIZE, DEFAULT_CHUNK_SIZE]
+    whose cost fits in `budget`, or None.
+    """
+    if cost(MIN_CHUNK_SIZE) > budget:
+        return None
+    low, high = MIN_CHUNK_SIZE, DEFAULT_CHUNK_SIZE
+    while low < high:
+        mid = (low + high + 1) // 2
+        if cost(mid) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def plan_dedup(memory_budget):
+    """
+    Pick the largest dedup window whose index fits in DEDUP_BUDGET_SHARE of
+    a budget, assuming the smallest blocks a plan can choose.
+
+    Returns:
+        Tuple[int, int]: log2 of the window and the bytes reserved for the index.
+
+    Raises:
+        MemoryBudgetError: If not even the smallest window fits.
+    """
+    share = int(memory_budget * DEDUP_BUDGET_SHARE)
+    for window_bits in range(DEFAULT_DEDUP_WINDOW_BITS, MIN_DEDUP_WINDOW_BITS - 1, -1):
+        index_bytes = DedupIndex.estimate_nbytes(window_bits, MIN_CHUNK_SIZE)
+        if index_bytes <= share:
+            return window_bits, index_bytes
+    index_bytes = DedupIndex.estimate_nbytes(MIN_DEDUP_WINDOW_BITS, MIN_CHUNK_SIZE)
+    raise MemoryBudgetError(
+        f"Memory budget of {memory_budget} bytes is too small for dedup: its index needs "
+        f"{index_bytes} bytes, so at least {int(index_bytes / DEDUP_BUDGET_SHARE)} bytes are needed.")
+
+
+def plan_compression(memory_budget, code_bit_length, max_dict_size=None, dedup=False, entropy=False):
+    """
+    Pick the dictionary limit and chunk size for compressing within a budget.
+
+    With `dedup`, the dedup index is given its share of the budget first
+    (see `plan_dedup`). If `max_dict_size` is given it is kept as is;
+    otherwise the largest dictionary that still leaves room for a minimal
+    chunk is chosen. The remaining budget goes to the streaming chunk.
+
+    With `dedup` or `entropy` every chunk becomes a block that is encoded,
+    and later decoded, whole; the chunk is then also small enough for
+    `plan_decompression` to fit such blocks in the same budget.
+
+    Parameters:
+        memory_budget (int): Bytes available for the dictionary and buffers.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        dedup (bool): Whether the dedup pre-pass runs as well.
+        entropy (bool): Whether the Huffman stage runs as well.
+
+    Returns:
+        MemoryPlan: The chosen settings.
+
+    Raises:
+        MemoryBudgetError: If no setting fits in the budget.
+    """
+    dedup_window_bits, dedup_bytes = None, 0
+    if dedup:
+        dedup_window_bits, dedup_bytes = plan_dedup(memory_budget)
+        memory_budget -= dedup_bytes
+
+    whole_blocks = dedup or entropy
+
+    def buffer_bytes(size, dict_limit):
+        buffers = compression_buffer_bytes(size, code_bit_length, dedup)
+        if not whole_blocks:
+            return buffers
+        # The block is also decoded whole, next to the buffers of a minimal
+        # decompression chunk and the smaller, unindexed dictionary
+        decoding = (CompactDictionary.estimate_nbytes(dict_limit, indexed=False)
+                    - CompactDictionary.estimate_nbytes(dict_limit)
+                    + decompression_buffer_bytes(MIN_CHUNK_SIZE, code_bit_length, dict_limit))
+        block = whole_block_bytes(size, code_bit_length)
+        if entropy:
+            block += huffman_table_bytes(size, dict_limit)
+        return max(buffers, decoding) + block
+
+    def minimum(dict_limit):
+        return CompactDictionary.estimate_nbytes(dict_limit) + buffer_bytes(MIN_CHUNK_SIZE, dict_limit)
+
+    if max_dict_size is None:
+        if minimum(ROOT_ENTRIES) > memory_budget:
+            raise MemoryBudgetError(
+                f"Memory budget of {memory_budget} bytes is too small: at least "
+                f"{minimum(ROOT_ENTRIES)} bytes are needed.")
+        low, high = ROOT_ENTRIES, 1 << code_bit_length
+        while low < high:
+            mid = (low + high + 1) // 2
+            if minimum(mid) <= memory_budget:
+                low = mid
+            else:
+                high = mid - 1
+        max_dict_size = low
+
+    dictionary_bytes = CompactDictionary.estimate_nbytes(max_dict_size)
+    chunk_size = _largest_chunk(memory_budget - dictionary_bytes,
+                                lambda size: buffer_bytes(size, max_dict_size))
+    if chunk_size is None:
+        raise MemoryBudgetError(
+            f"Memory budget of {memory_budget} bytes is too small for a dictionary of "
+            f"{max_dict_size} entries: at least {minimum(max_dict_size)} bytes are needed.")
+    return MemoryPlan(max_dict_size, chunk_size, dictionary_bytes,
+                      buffer_bytes(chunk_size, max_dict_size),
+                      dedup_window_bits, dedup_bytes)
+
+
+def plan_decompression(memory_budget, code_bit_length, max_dict_size=None, block_size=None,
+                       entropy=False):
+    """
+    Pick the chunk size for decompressing within a budget.
+
+    The dictionary limit is fixed by the compressed file; without a limit
+    the dictionary can hold every code of `code_bit_length` bits. So is the
+    size of blocks that must be decoded whole.
+
+    Parameters:
+        memory_budget (int): Bytes available for the dictionary and buffers.
+        code_bit_length (int): Number of bits used to represent each code.
+        max_dict_size (int, optional): The maximum size of the dictionary.
+        block_size (int, optional): Original length of the largest block,
+                                    for streams whose blocks are decoded
+                                    whole (Huffman or dedup stages).
+        entropy (bool): Whether those blocks carry Huffman tables.
+
+    Returns:
+        MemoryPlan: The chosen settings.
+
+    Raises:
+        MemoryBudgetError: If the file cannot be decompressed within the budget.
+    """
+    dict_limit = max_dict_size if max_dict_size else 1 << code_bit_length
+    dictionary_bytes = CompactDictionary.estimate_nbytes(dict_limit, indexed=False)
+    block_bytes = 0
+    if block_size:
+        block_bytes = whole_block_bytes(block_size, code_bit_length)
+        if entropy:
+            block_bytes += huffman_table_bytes(block_size, dict_limit)
+
+    def cost(size):
+        return decompression_buffer_bytes(size, code_bit_length, dict_limit) + block_bytes
+
+    chunk_size = _largest_chunk(memory_budget - dictionary_bytes, cost)
+    if chunk_size is None:
+        blocks = f" and blocks of {block_size} bytes" if block_size else ""
+        raise MemoryBudgetError(
+            f"Memory budget of {memory_budget} bytes is too small to decompress with a dictionary of "
+            f"{dict_limit} entries{blocks}: at least {dictionary_bytes + cost(MIN_CHUNK_SIZE)} bytes are needed.")
+    return MemoryPlan(max_dict_size, chunk_size, dictionary_bytes, cost(chunk_size))
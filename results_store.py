@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import time
+import uuid
+
+# Default location of the results database, next to the output_* directories.
+DEFAULT_RESULTS_DB = 'Compression_Results.sqlite'
+
+# Result row keys, as used by compress_files and the Excel reports.
+RESULT_COLUMNS = [
+    'File Name',
+    'Compressed File',
+    'Original Size (bytes)',
+    'Compressed Size (bytes)',
+    'Compression Ratio',
+    'Compression Performance (%)',
+    'Max Dictionary Size',
+    'Code Bit Length'
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    file_name TEXT NOT NULL,
+    compressed_file TEXT,
+    original_size INTEGER,
+    compressed_size INTEGER,
+    compression_ratio REAL,
+    compression_performance REAL,
+    max_dict_size INTEGER,          -- NULL means no limit
+    code_bit_length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_params
+    ON results (file_name, max_dict_size, code_bit_length);
+CREATE TABLE IF NOT EXISTS imported_workbooks (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+_SELECT_COLUMNS = """
+    file_name, compressed_file, original_size, compressed_size,
+    compression_ratio, compression_performance, max_dict_size, code_bit_length
+"""
+
+
+def _row_to_result(row):
+    result = dict(zip(RESULT_COLUMNS, row))
+    if result['Max Dictionary Size'] is None:
+        result['Max Dictionary Size'] = 'No Limit'
+    return result
+
+
+class ResultsStore:
+    """
+    Append-only SQLite store of compression results.
+
+    Each call to `append_results` records one run. Rows are indexed on
+    (file name, dictionary size, code bit length), so reports query the
+    store instead of reloading every run's workbook.
+
+    Parameters:
+        path (str): The database file.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def append_results(self, results, run_id=None):
+        """
+        Append the result rows of one run.
+
+        Parameters:
+            results (List[dict]): Rows keyed like RESULT_COLUMNS.
+            run_id (str, optional): Identifier of the run; generated if omitted.
+
+        Returns:
+            str: The run identifier.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        recorded_at = time.time()
+        rows = []
+        for result in results:
+            max_dict_size = result['Max Dictionary Size']
+            rows.append((
+                run_id,
+                recorded_at,
+                result['File Name'],
+                result['Compressed File'],
+                result['Original Size (bytes)'],
+                result['Compressed Size (bytes)'],
+                float(result['Compression Ratio']),
+                float(result['Compression Performance (%)']),
+                None if max_dict_size in (None, 'No Limit') else int(max_dict_size),
+                int(result['Code Bit Length']),
+            ))
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO results (run_id, recorded_at, file_name, compressed_file,
+                                        original_size, compressed_size, compression_ratio,
+                                        compression_performance, max_dict_size, code_bit_length)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+        return run_id
+
+    def latest_results(self):
+        """
+        Return the most recent row for every (file, dictionary size, code
+        bit length) combination.
+
+        Returns:
+            List[dict]: Rows keyed like RESULT_COLUMNS.
+        """
+        cursor = self.conn.execute(f"""
+            SELECT {_SELECT_COLUMNS} FROM results
+            WHERE id IN (SELECT MAX(id) FROM results
+                         GROUP BY file_name, max_dict_size, code_bit_length)
+            ORDER BY file_name, code_bit_length, max_dict_size""")
+        return [_row_to_result(row) for row in cursor]
+
+    def results_for(self, file_name=None, max_dict_size=None, code_bit_length=None):
+        """
+        Return all rows matching the given filters, oldest first.
+        """
+        clauses = []
+        params = []
+        if file_name is not None:
+            clauses.append('file_name = ?')
+            params.append(file_name)
+        if max_dict_size is not None:
+            if max_dict_size == 'No Limit':
+                clauses.append('max_dict_size IS NULL')
+            else:
+                clauses.append('max_dict_size = ?')
+                params.append(int(max_dict_size))
+        if code_bit_length is not None:
+            clauses.append('code_bit_length = ?')
+            params.append(int(code_bit_length))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        cursor = self.conn.execute(f"SELECT {_SELECT_COLUMNS} FROM results {where} ORDER BY id", params)
+        return [_row_to_result(row) for row in cursor]
+
+    def is_imported(self, workbook_path):
+        """
+        Return True if `workbook_path` was imported and has not changed since.
+        """
+        row = self.conn.execute('SELECT mtime_ns FROM imported_workbooks WHERE path = ?',
+                                (os.path.abspath(workbook_path),)).fetchone()
+        return row is not None and row[0] == os.stat(workbook_path).st_mtime_ns
+
+    def mark_imported(self, workbook_path):
+        """
+        Record that the rows of `workbook_path` are in the store.
+        """
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO imported_workbooks (path, mtime_ns) VALUES (?, ?)',
+                              (os.path.abspath(workbook_path), os.stat(workbook_path).st_mtime_ns))
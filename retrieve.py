@@ -1,6 +1,7 @@
 import os
 import re
 import openpyxl
+from results_store import ResultsStore
 
 def find_output_directories():
     """
@@ -78,6 +79,23 @@ def aggregate_excel_files(excel_files):
 
     return aggregated_data
 
+def import_excel_files(store, excel_files):
+    """
+    Imports the rows of Excel files written by earlier runs into the results
+    store. Workbooks already imported and unchanged since are skipped, so
+    each workbook is loaded only once.
+    Returns the number of rows imported.
+    """
+    imported = 0
+    for excel_file_path, parameters in excel_files:
+        if store.is_imported(excel_file_path):
+            continue
+        rows = aggregate_excel_files([(excel_file_path, parameters)])
+        store.append_results(rows)
+        store.mark_imported(excel_file_path)
+        imported += len(rows)
+    return imported
+
 def save_aggregated_data(aggregated_data):
     """
     Saves the aggregated data to a new Excel file.
@@ -118,26 +136,20 @@ def save_aggregated_data(aggregated_data):
     print(f"Aggregated results saved to '{output_file_name}'.")
 
 if __name__ == "__main__":
-    # Find all output directories
-    output_dirs = find_output_directories()
-
-    if not output_dirs:
-        print("No output directories found.")
-        exit(1)
-
-    # Retrieve Excel files from the directories
-    excel_files = retrieve_excel_files(output_dirs)
-
-    if not excel_files:
-        print("No Excel files found in the output directories.")
-        exit(1)
+    with ResultsStore() as store:
+        # Bring in workbooks from runs that predate the results store
+        output_dirs = find_output_directories()
+        excel_files = retrieve_excel_files(output_dirs)
+        imported = import_excel_files(store, excel_files)
+        if imported:
+            print(f"Imported {imported} rows from Excel files into '{store.path}'.")
 
-    # Aggregate data from the Excel files
-    aggregated_data = aggregate_excel_files(excel_files)
+        # Latest result per (file, dictionary size, code bit length), via the index
+        aggregated_data = store.latest_results()
 
     if not aggregated_data:
-        print("No data found in the Excel files.")
+        print("No results found in the results store or the output directories.")
         exit(1)
 
     # Save aggregated data to a new Excel file
-    save_aggregated_data(aggregated_data)
\ No newline at end of file
+    save_aggregated_data(aggregated_data)
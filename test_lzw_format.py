@@ -0,0 +1,122 @@
+import os
+import random
+
+import pytest
+
+from archive import ArchiveReader, ArchiveWriter, extract_all, verify_archive
+from decompressor import decompress_single_file
+from lzw_append import update_file
+from lzw_codec import compress_file_streaming
+from lzw_format import (BLOCK_HEADER, FLAG_DEDUP, FLAG_HUFFMAN, HEADER, CorruptFileError, compress_file,
+                        decompress_file, is_block_format, verify_file)
+
+BLOCK_SIZE = 16 * 1024
+
+
+def sample_data(size=96 * 1024, seed=1):
+    """
+    Text with a repeated random region, so that every stage has work to do.
+    """
+    rng = random.Random(seed)
+    words = [b'lorem', b'ipsum', b'dolor', b'sit', b'amet', b'block', b'stream']
+    text = b' '.join(rng.choice(words) for _ in range(size // 12))
+    noise = bytes(rng.getrandbits(8) for _ in range(8 * 1024))
+    return text[:size // 2] + noise + text[size // 2:] + noise
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('flags', [0, FLAG_HUFFMAN, FLAG_DEDUP, FLAG_HUFFMAN | FLAG_DEDUP])
+@pytest.mark.parametrize('compact', [False, True])
+def test_round_trip(tmp_path, flags, compact):
+    data = sample_data()
+    source = write(tmp_path / 'in.txt', data)
+    compressed = str(tmp_path / 'in.lzw')
+    output = str(tmp_path / 'out.txt')
+
+    assert compress_file(source, compressed, 16, 1 << 16, BLOCK_SIZE, flags, compact=compact)[0] == len(data)
+    assert is_block_format(compressed)
+    assert decompress_file(compressed, output, compact=compact) == len(data)
+    assert read(output) == data
+    assert verify_file(compressed)['Original Size (bytes)'] == len(data)
+
+
+def test_legacy_headerless_file(tmp_path):
+    # Legacy files hold text, which the legacy path writes back as UTF-8
+    data = sample_data()[:40 * 1024]
+    source = write(tmp_path / 'in.txt', data)
+    legacy_dir = tmp_path / 'output_dict4096_code12bit'
+    legacy_dir.mkdir()
+    compressed = str(legacy_dir / 'in.lzw')
+    compress_file_streaming(source, compressed, 12, 4096)
+
+    assert not is_block_format(compressed)
+    for memory_budget in (None, 1 << 20):
+        output, size = decompress_single_file(compressed, memory_budget)
+        assert read(output) == data and size == len(data)
+
+
+@pytest.mark.parametrize('flags', [0, FLAG_HUFFMAN | FLAG_DEDUP])
+def test_corrupted_file_is_rejected(tmp_path, flags):
+    source = write(tmp_path / 'in.txt', sample_data())
+    compressed = str(tmp_path / 'in.lzw')
+    output = str(tmp_path / 'out.txt')
+    compress_file(source, compressed, 16, 1 << 16, BLOCK_SIZE, flags)
+    original = read(compressed)
+
+    corrupted = bytearray(original)
+    corrupted[HEADER.size + BLOCK_HEADER.size + 40] ^= 0x10
+    write(compressed, bytes(corrupted))
+    with pytest.raises(CorruptFileError):
+        decompress_file(compressed, output)
+    assert not os.path.exists(output)
+    with pytest.raises(CorruptFileError):
+        verify_file(compressed)
+
+    write(compressed, original[:len(original) // 2])
+    with pytest.raises(CorruptFileError):
+        decompress_file(compressed, output)
+    assert not os.path.exists(output)
+
+
+def test_archive_list_and_extract(tmp_path):
+    first = sample_data(seed=1)
+    second = sample_data(seed=2)
+    archive_path = str(tmp_path / 'files.lza')
+    with ArchiveWriter(archive_path) as archive:
+        archive.add_file(write(tmp_path / 'a.txt', first), 12, 4096, arcname='a/x.txt', block_size=BLOCK_SIZE)
+        archive.add_file(write(tmp_path / 'b.txt', second), 16, None, arcname='b/x.txt',
+                         block_size=BLOCK_SIZE, flags=FLAG_HUFFMAN | FLAG_DEDUP)
+        with pytest.raises(ValueError):
+            archive.add_file(str(tmp_path / 'b.txt'), 12, 4096, arcname='a/x.txt')
+
+    with ArchiveReader(archive_path) as reader:
+        assert [(m.name, m.original_size) for m in reader.list()] == [('a/x.txt', len(first)),
+                                                                       ('b/x.txt', len(second))]
+    assert verify_archive(archive_path)['Members'] == 2
+
+    extracted = extract_all(archive_path, str(tmp_path / 'out'), memory_budget=8 << 20)
+    assert [read(path) for path in extracted] == [first, second]
+
+
+@pytest.mark.parametrize('flags', [0, FLAG_DEDUP])
+def test_append_then_decode(tmp_path, flags):
+    data = sample_data()
+    source = write(tmp_path / 'log.txt', data[:40 * 1024])
+    compressed = str(tmp_path / 'log.lzw')
+    output = str(tmp_path / 'out.txt')
+
+    assert update_file(source, compressed, 16, 1 << 16, BLOCK_SIZE, flags) == 40 * 1024
+    write(source, data)
+    assert update_file(source, compressed, block_size=BLOCK_SIZE) == len(data) - 40 * 1024
+    assert decompress_file(compressed, output) == len(data)
+    assert read(output) == data